@@ -1,7 +1,10 @@
 import os
+import click
+from functools import lru_cache
 from flask import Flask
 from config import Config, validate_config
 from models import db
+from extensions import cache, ORJSONProvider
 import firebase_admin
 from firebase_admin import credentials
 
@@ -12,30 +15,59 @@ from blueprints.admin import admin_bp
 from blueprints.account import account_bp
 
 
-def create_app():
+# Config is validated once per process, not on every create_app() call
+_config_validated = False
+
+
+@lru_cache(maxsize=4)
+def _load_firebase_credentials(cred_path):
+    """Parse the service-account file once per process and reuse it"""
+    return credentials.Certificate(cred_path)
+
+
+def _index_names(table_name):
+    """Names of every index on a table, expression indexes included (the reflection API skips those)"""
+    if db.engine.dialect.name == "sqlite":
+        rows = db.session.execute(db.text(f'PRAGMA index_list("{table_name}")'))
+        return {row[1] for row in rows}
+    rows = db.session.execute(db.text(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+    ), {"table": table_name})
+    return {row[0] for row in rows}
+
+
+def create_app(config_class=Config):
     """Application factory pattern"""
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
+    app.json = ORJSONProvider(app)
     
     # ✅ Validate configuration before starting
+    global _config_validated
     try:
-        validate_config()
+        if not _config_validated and not app.testing:
+            validate_config()
+            _config_validated = True
     except (ValueError, FileNotFoundError) as e:
         print(f"❌ Configuration Error: {e}")
         print("\nPlease check your .env file and ensure all required variables are set.")
         print("See .env.example for reference.")
         raise
     
-    # Initialize database
+    # Initialize database and cache
     db.init_app(app)
+    cache.init_app(app)
     
     # Initialize Firebase Admin SDK (server-side)
+    # ✅ Skip re-init when create_app() runs more than once (gunicorn --preload), and under tests
     try:
-        cred = credentials.Certificate(app.config['FIREBASE_CREDENTIALS'])
-        firebase_admin.initialize_app(cred, {
-            'storageBucket': app.config['FIREBASE_STORAGE_BUCKET']
-        })
-        print("✅ Firebase Admin SDK initialized")
+        if not firebase_admin._apps and not app.testing:
+            cred = _load_firebase_credentials(app.config['FIREBASE_CREDENTIALS'])
+            firebase_admin.initialize_app(cred, {
+                'storageBucket': app.config['FIREBASE_STORAGE_BUCKET']
+            })
+            print("✅ Firebase Admin SDK initialized")
     except Exception as e:
         print(f"❌ Firebase initialization failed: {e}")
         raise
@@ -49,37 +81,146 @@ def create_app():
     app.register_blueprint(account_bp, url_prefix='/account')
     
     # ✅ Register API routes at root level (for frontend compatibility)
-    from blueprints.auth import api_login, api_register, api_logout
+    from blueprints.auth import api_login, api_register, api_logout, normalize_phone_e164
+    
+    app.add_url_rule('/api/login', 'root_api_login', view_func=api_login, methods=['POST'])
+    app.add_url_rule('/api/register', 'root_api_register', view_func=api_register, methods=['POST'])
+    app.add_url_rule('/api/logout', 'root_api_logout', view_func=api_logout, methods=['POST'])
+    
+    # ✅ Load phonenumbers region metadata now rather than on the first register/login
+    normalize_phone_e164("+61412345678")
+    
+    @app.cli.command("create-db")
+    def create_db():
+        """Create any missing database tables"""
+        db.create_all()
+        print("✅ Database tables created/verified")
+    
+    @app.cli.command("add-phone-unique-key")
+    def add_phone_unique_key():
+        """Add the users.phone unique key to a database created before it existed"""
+        from models import User
+        
+        # create-db never alters existing tables, so older installs need this once
+        inspector = db.inspect(db.engine)
+        unique_sets = [c["column_names"] for c in inspector.get_unique_constraints("users")]
+        unique_sets += [i["column_names"] for i in inspector.get_indexes("users") if i["unique"]]
+        if ["phone"] in unique_sets:
+            print("✅ users.phone already has a unique key")
+            return
+        
+        duplicates = db.session.execute(
+            db.select(User.phone, db.func.count(User.id))
+            .where(User.phone.isnot(None))
+            .group_by(User.phone)
+            .having(db.func.count(User.id) > 1)
+        ).all()
+        if duplicates:
+            for phone, count in duplicates:
+                print(f"   {phone!r}: {count} users")
+            raise click.ClickException("Resolve the duplicate phone numbers above, then re-run")
+        
+        db.session.execute(db.text("ALTER TABLE users ADD UNIQUE KEY phone (phone)"))
+        db.session.commit()
+        print("✅ Unique key added on users.phone")
+    
+    @app.cli.command("add-indexes")
+    def add_indexes():
+        """Create any model index missing from an existing database (safe to re-run)"""
+        # create-db skips tables that already exist, so indexes added to the models later need this
+        inspector = db.inspect(db.engine)
+        created, failed = 0, 0
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = _index_names(table.name)
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name in existing:
+                    continue
+                try:
+                    index.create(bind=db.engine)
+                except Exception as e:
+                    # e.g. DATE() expression indexes need MySQL 8.0.13+
+                    print(f"❌ {table.name}.{index.name}: {e}")
+                    failed += 1
+                    continue
+                print(f"✅ Created {table.name}.{index.name}")
+                created += 1
+        
+        if failed:
+            raise click.ClickException(f"{failed} index(es) could not be created")
+        print(f"✅ Indexes verified ({created} created)")
+    
+    @app.cli.command("migrate-status-enums")
+    def migrate_status_enums():
+        """Widen existing admin_status ENUM columns to every status the models allow"""
+        from models import Category1Listing, Category2Listing, Category3Product
+        
+        # create-db never alters existing tables; older MySQL installs only have pending/approved/rejected
+        if db.engine.dialect.name != "mysql":
+            print("⏭️  admin_status is only a native ENUM on MySQL, nothing to alter")
+            return
+        
+        inspector = db.inspect(db.engine)
+        for model in (Category1Listing, Category2Listing, Category3Product):
+            table = model.__tablename__
+            column = next(c for c in inspector.get_columns(table) if c["name"] == "admin_status")
+            current = tuple(getattr(column["type"], "enums", ()))
+            wanted = tuple(model.admin_status.type.enums)
+            if set(wanted) <= set(current):
+                print(f"✅ {table}.admin_status already allows every status")
+                continue
+            
+            # Values already in the column but not in the model are kept so no row is truncated
+            values = wanted + tuple(v for v in current if v not in wanted)
+            enum_sql = ", ".join("'{}'".format(v.replace("'", "''")) for v in values)
+            null_sql = "NULL" if column["nullable"] else "NOT NULL"
+            db.session.execute(db.text(
+                f"ALTER TABLE {table} MODIFY admin_status ENUM({enum_sql}) {null_sql} DEFAULT 'pending'"
+            ))
+            print(f"✅ {table}.admin_status now allows: {', '.join(values)}")
+        db.session.commit()
     
-    @app.route('/api/login', methods=['POST'])
-    def root_api_login():
-        """Proxy to auth blueprint's api_login"""
-        return api_login()
+    @app.cli.command("rebuild-visit-rollup")
+    def rebuild_visit_rollup():
+        """Recompute site_visit_rollup from the raw site_visits table"""
+        from models import SiteVisit, SiteVisitRollup
+        
+        SiteVisitRollup.query.delete()
+        db.session.execute(SiteVisitRollup.__table__.insert().from_select(
+            ["page_url", "visit_count", "updated_at"],
+            db.select(SiteVisit.page_url, db.func.count(SiteVisit.id), db.func.now())
+            .where(SiteVisit.page_url.isnot(None))
+            .group_by(SiteVisit.page_url)
+        ))
+        db.session.commit()
+        print("✅ Site visit rollup rebuilt")
     
-    @app.route('/api/register', methods=['POST'])
-    def root_api_register():
-        """Proxy to auth blueprint's api_register"""
-        return api_register()
+    @app.cli.command("rollup-daily-stats")
+    @click.option("--days", default=1, type=click.IntRange(min=1), show_default=True, help="Complete days to (re)compute, ending yesterday")
+    def rollup_daily_stats_command(days):
+        """Write per-day analytics totals into daily_stats (schedule nightly)"""
+        from blueprints.admin import rollup_daily_stats
+        
+        rollup_daily_stats(days)
+        print(f"✅ Daily stats rolled up for the last {days} day(s)")
     
-    @app.route('/api/logout', methods=['POST'])
-    def root_api_logout():
-        """Proxy to auth blueprint's api_logout"""
-        return api_logout()
+    # Expose only frontend-safe Firebase config (built once, shared by every render)
+    firebase_frontend_config = {
+        'apiKey': app.config['FIREBASE_API_KEY'],
+        'authDomain': app.config['FIREBASE_AUTH_DOMAIN'],
+        'projectId': app.config['FIREBASE_PROJECT_ID'],
+        'storageBucket': app.config['FIREBASE_STORAGE_BUCKET'],
+        'messagingSenderId': app.config['FIREBASE_MESSAGING_SENDER_ID'],
+        'appId': app.config['FIREBASE_APP_ID']
+    }
     
     # Make config available to templates
     @app.context_processor
     def inject_config():
         return dict(
             config=app.config,
-            # Expose only frontend-safe Firebase config
-            firebase_config={
-                'apiKey': app.config['FIREBASE_API_KEY'],
-                'authDomain': app.config['FIREBASE_AUTH_DOMAIN'],
-                'projectId': app.config['FIREBASE_PROJECT_ID'],
-                'storageBucket': app.config['FIREBASE_STORAGE_BUCKET'],
-                'messagingSenderId': app.config['FIREBASE_MESSAGING_SENDER_ID'],
-                'appId': app.config['FIREBASE_APP_ID']
-            }
+            firebase_config=firebase_frontend_config
         )
     
     print(f"✅ Flask app created successfully")
@@ -93,13 +234,15 @@ def create_app():
 if __name__ == "__main__":
     app = create_app()
     
-    with app.app_context():
-        try:
-            db.create_all()
-            print("✅ Database tables created/verified")
-        except Exception as e:
-            print(f"❌ Database initialization failed: {e}")
-            raise
+    # Schema creation is opt-in so restarts don't re-introspect the database
+    if os.environ.get("MAA_CREATE_ALL") == "1":
+        with app.app_context():
+            try:
+                db.create_all()
+                print("✅ Database tables created/verified")
+            except Exception as e:
+                print(f"❌ Database initialization failed: {e}")
+                raise
     
     print("\n" + "="*60)
     print("🚀 MAA EXPRESS - STARTING SERVER")
@@ -1,26 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from functools import wraps
-from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, abort
+import hmac
+from datetime import datetime, date
+from sqlalchemy.orm import load_only
 from models import db, User, Category1Listing, Category2Listing, Category3Product, Category1BuyerInfo
+from blueprints.auth_utils import login_required, get_current_user
 
 account_bp = Blueprint("account", __name__, url_prefix="/account")
 
 
-# ============================================
-# LOGIN REQUIRED DECORATOR
-# ============================================
-
-def login_required(f):
-    """Decorator to require login for account routes"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if "user_id" not in session:
-            flash("Please log in to access this page", "error")
-            return redirect(url_for("auth.login_page"))
-        return f(*args, **kwargs)
-    return decorated_function
-
-
 # ============================================
 # MAIN ACCOUNT PAGE
 # ============================================
@@ -30,7 +17,7 @@ def login_required(f):
 def account():
     """User account page - My Account"""
     user_id = session["user_id"]
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user:
         flash("User not found", "error")
@@ -38,33 +25,41 @@ def account():
     
     # Get user's listings (exclude deleted)
     cat1_listings = Category1Listing.query.filter(
-        Category1Listing.user_id == user_id,
+        Category1Listing.seller_id == user_id,
         Category1Listing.admin_status != 'deleted'
     ).order_by(Category1Listing.created_at.desc()).all()
     
     cat2_listings = Category2Listing.query.filter(
-        Category2Listing.user_id == user_id,
+        Category2Listing.seller_id == user_id,
         Category2Listing.admin_status != 'deleted'
     ).order_by(Category2Listing.created_at.desc()).all()
     
     cat3_products = Category3Product.query.filter(
-        Category3Product.user_id == user_id,
+        Category3Product.seller_id == user_id,
         Category3Product.admin_status != 'deleted'
     ).order_by(Category3Product.created_at.desc()).all()
     
     # Get purchase history (Category1BuyerInfo where buyer is current user)
-    cat1_purchases = Category1BuyerInfo.query.filter_by(buyer_user_id=user_id).order_by(
+    cat1_purchases = Category1BuyerInfo.query.filter_by(buyer_id=user_id).order_by(
         Category1BuyerInfo.created_at.desc()
     ).all()
     
-    # ✅ NEW: Enrich purchases with listing data
-    enriched_purchases = []
-    for purchase in cat1_purchases:
-        listing = Category1Listing.query.get(purchase.listing_id)
-        enriched_purchases.append({
+    # ✅ NEW: Enrich purchases with listing data (single IN query, no N+1)
+    listing_ids = {purchase.listing_id for purchase in cat1_purchases}
+    listings_by_id = {}
+    if listing_ids:
+        listings_by_id = {
+            listing.id: listing
+            for listing in Category1Listing.query.filter(Category1Listing.id.in_(listing_ids)).all()
+        }
+
+    enriched_purchases = [
+        {
             'purchase': purchase,
-            'listing': listing
-        })
+            'listing': listings_by_id.get(purchase.listing_id)
+        }
+        for purchase in cat1_purchases
+    ]
     
     return render_template(
         "account/account.html",
@@ -88,15 +83,32 @@ def sales_dashboard():
     ✅ UPDATED: Pass buyer_contact_visible flag for each sale
     """
     user_id = session["user_id"]
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user:
         flash("User not found", "error")
         return redirect(url_for("main.index"))
     
-    # Get all Category1 listings owned by this seller
-    seller_listings = Category1Listing.query.filter_by(user_id=user_id).all()
-    listing_ids = [listing.id for listing in seller_listings]
+    # Get all Category1 listings owned by this seller (only the columns the dashboard renders)
+    seller_listings = Category1Listing.query.options(
+        load_only(
+            Category1Listing.id,
+            Category1Listing.title,
+            Category1Listing.origin,
+            Category1Listing.destination,
+            Category1Listing.currency
+        )
+    ).filter_by(seller_id=user_id).all()
+    listing_map = {listing.id: listing for listing in seller_listings}
+    listing_ids = list(listing_map)
+    
+    # No listings means no sales - skip the empty IN () query
+    if not listing_ids:
+        return render_template(
+            "account/sales_dashboard.html",
+            user=user,
+            cat1_sales=[]
+        )
     
     # Get all buyer_info records for these listings (orders/sales)
     cat1_sales = Category1BuyerInfo.query.filter(
@@ -106,7 +118,7 @@ def sales_dashboard():
     # ✅ NEW: Enrich each sale with buyer contact visibility flag
     enriched_sales = []
     for sale in cat1_sales:
-        listing = Category1Listing.query.get(sale.listing_id)
+        listing = listing_map.get(sale.listing_id)
         
         # ✅ BUYER CONTACT VISIBLE ONLY AFTER PAYMENT COMPLETED
         buyer_contact_visible = (sale.payment_status == 'paid')
@@ -128,152 +140,160 @@ def sales_dashboard():
 # EDIT LISTING ROUTES
 # ============================================
 
+# Editable form fields per model: (name, type, max length for str, default)
+# A default of None on a numeric field stores None when the field is left blank.
+CATEGORY1_FORM_FIELDS = (
+    ("title", str, 255, ""),
+    ("description", str, 2000, ""),
+    ("origin", str, 255, ""),
+    ("origin_airport", str, 100, ""),
+    ("origin_delivery_location", str, 255, ""),
+    ("origin_delivery_postcode", str, 20, ""),
+    ("destination", str, 255, ""),
+    ("destination_airport", str, 100, ""),
+    ("destination_delivery_location", str, 255, ""),
+    ("destination_delivery_postcode", str, 20, ""),
+    ("price_per_kg", float, None, 0),
+    ("total_weight", float, None, 0),
+    ("discount_percent", float, None, 0),
+    ("travel_date", date, None, None),
+)
+
+CATEGORY2_FORM_FIELDS = (
+    ("title", str, 255, ""),
+    ("description", str, 2000, ""),
+    ("origin", str, 255, ""),
+    ("destination", str, 255, ""),
+    ("travel_date", date, None, None),
+    ("price", float, None, 0),
+)
+
+CATEGORY3_FORM_FIELDS = (
+    ("product_name", str, 255, ""),
+    ("product_origin_country", str, 255, ""),
+    ("description", str, 2000, ""),
+    ("price", float, None, 0),
+    ("currency", str, 10, "AUD"),
+    ("authenticity_proof_url", str, 500, ""),
+    ("image_url", str, 500, ""),
+)
+
+
+# Per-category edit config shared by the generic edit/update handlers
+EDIT_REGISTRY = {
+    1: {
+        "model": Category1Listing,
+        "template": "account/edit_category1.html",
+        "context_name": "listing",
+        "id_arg": "listing_id",
+        "label": "Listing",
+        "fields": CATEGORY1_FORM_FIELDS,
+    },
+    2: {
+        "model": Category2Listing,
+        "template": "account/edit_category2.html",
+        "context_name": "listing",
+        "id_arg": "listing_id",
+        "label": "Listing",
+        "fields": CATEGORY2_FORM_FIELDS,
+    },
+    3: {
+        "model": Category3Product,
+        "template": "account/edit_category3.html",
+        "context_name": "product",
+        "id_arg": "product_id",
+        "label": "Product",
+        "fields": CATEGORY3_FORM_FIELDS,
+    },
+}
+
+
+def apply_form_fields(obj, form, fields):
+    """Copy form values onto obj, truncating strings and converting numbers/dates"""
+    for name, field_type, max_length, default in fields:
+        if field_type is str:
+            setattr(obj, name, form.get(name, default)[:max_length])
+        elif field_type is date:
+            # Dates are only changed when a value is submitted
+            value = form.get(name)
+            if value:
+                setattr(obj, name, date.fromisoformat(value))
+        elif default is None:
+            value = form.get(name)
+            setattr(obj, name, field_type(value) if value else None)
+        else:
+            setattr(obj, name, field_type(form.get(name, default)))
+
+
+def _edit_item(category, item_id):
+    """Render the edit form for one of the current user's items"""
+    entry = EDIT_REGISTRY[category]
+    item = entry["model"].query.filter_by(id=item_id, seller_id=session["user_id"]).first_or_404()
+    return render_template(entry["template"], **{entry["context_name"]: item})
+
+
+def _update_item(category, item_id):
+    """Apply the edit form to one of the current user's items"""
+    entry = EDIT_REGISTRY[category]
+    item = entry["model"].query.filter_by(id=item_id, seller_id=session["user_id"]).first_or_404()
+    
+    try:
+        apply_form_fields(item, request.form, entry["fields"])
+        
+        # If item was approved, mark as pending for re-review
+        if item.admin_status == "approved":
+            item.admin_status = "pending"
+        
+        db.session.commit()
+        flash(f"{entry['label']} updated successfully", "success")
+        return redirect(url_for("account.account"))
+    
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error updating {entry['label'].lower()}: {str(e)}", "error")
+        return redirect(url_for(f"account.edit_category{category}", **{entry["id_arg"]: item_id}))
+
+
 @account_bp.route("/category1/<int:listing_id>/edit", methods=["GET"])
 @login_required
 def edit_category1(listing_id):
     """Show edit form for Category1 listing"""
-    user_id = session["user_id"]
-    listing = Category1Listing.query.filter_by(id=listing_id, user_id=user_id).first_or_404()
-    return render_template("account/edit_category1.html", listing=listing)
+    return _edit_item(1, listing_id)
 
 
 @account_bp.route("/category1/<int:listing_id>/edit", methods=["POST"])
 @login_required
 def update_category1(listing_id):
     """Update Category1 listing (simple form, not wizard)"""
-    user_id = session["user_id"]
-    listing = Category1Listing.query.filter_by(id=listing_id, user_id=user_id).first_or_404()
-    
-    form = request.form
-    
-    try:
-        # Update basic info
-        listing.title = form.get("title", "")[:255]
-        listing.description = form.get("description", "")[:2000]
-        
-        # Update origin
-        listing.origin = form.get("origin", "")[:255]
-        listing.origin_airport = form.get("origin_airport", "")[:100]
-        listing.origin_delivery_location = form.get("origin_delivery_location", "")[:255]
-        listing.origin_delivery_postcode = form.get("origin_delivery_postcode", "")[:20]
-        
-        # Update destination
-        listing.destination = form.get("destination", "")[:255]
-        listing.destination_airport = form.get("destination_airport", "")[:100]
-        listing.destination_delivery_location = form.get("destination_delivery_location", "")[:255]
-        listing.destination_delivery_postcode = form.get("destination_delivery_postcode", "")[:20]
-        
-        # Update pricing
-        listing.price_per_kg = float(form.get("price_per_kg", 0))
-        listing.total_weight = float(form.get("total_weight", 0))
-        listing.discount_percent = float(form.get("discount_percent", 0))
-        
-        # Update travel date
-        travel_date_str = form.get("travel_date")
-        if travel_date_str:
-            listing.travel_date = datetime.strptime(travel_date_str, "%Y-%m-%d").date()
-        
-        # If listing was approved, mark as pending for re-review
-        if listing.admin_status == "approved":
-            listing.admin_status = "pending"
-        
-        listing.updated_at = datetime.utcnow()
-        
-        db.session.commit()
-        flash("Listing updated successfully", "success")
-        return redirect(url_for("account.account"))
-    
-    except Exception as e:
-        db.session.rollback()
-        flash(f"Error updating listing: {str(e)}", "error")
-        return redirect(url_for("account.edit_category1", listing_id=listing_id))
+    return _update_item(1, listing_id)
 
 
 @account_bp.route("/category2/<int:listing_id>/edit", methods=["GET"])
 @login_required
 def edit_category2(listing_id):
     """Show edit form for Category2 listing"""
-    user_id = session["user_id"]
-    listing = Category2Listing.query.filter_by(id=listing_id, user_id=user_id).first_or_404()
-    return render_template("account/edit_category2.html", listing=listing)
+    return _edit_item(2, listing_id)
 
 
 @account_bp.route("/category2/<int:listing_id>/edit", methods=["POST"])
 @login_required
 def update_category2(listing_id):
     """Update Category2 listing"""
-    user_id = session["user_id"]
-    listing = Category2Listing.query.filter_by(id=listing_id, user_id=user_id).first_or_404()
-    
-    form = request.form
-    
-    try:
-        listing.title = form.get("title", "")[:255]
-        listing.description = form.get("description", "")[:2000]
-        listing.gender = form.get("gender", "")[:20]
-        listing.age = int(form.get("age", 0)) if form.get("age") else None
-        listing.travel_from = form.get("travel_from", "")[:255]
-        listing.travel_to = form.get("travel_to", "")[:255]
-        listing.budget_min = float(form.get("budget_min", 0))
-        listing.budget_max = float(form.get("budget_max", 0))
-        listing.travel_dates = form.get("travel_dates", "")[:255]
-        listing.image_url = form.get("image_url", "")[:500]
-        
-        if listing.admin_status == "approved":
-            listing.admin_status = "pending"
-        
-        listing.updated_at = datetime.utcnow()
-        
-        db.session.commit()
-        flash("Listing updated successfully", "success")
-        return redirect(url_for("account.account"))
-    
-    except Exception as e:
-        db.session.rollback()
-        flash(f"Error updating listing: {str(e)}", "error")
-        return redirect(url_for("account.edit_category2", listing_id=listing_id))
+    return _update_item(2, listing_id)
 
 
 @account_bp.route("/category3/<int:product_id>/edit", methods=["GET"])
 @login_required
 def edit_category3(product_id):
     """Show edit form for Category3 product"""
-    user_id = session["user_id"]
-    product = Category3Product.query.filter_by(id=product_id, user_id=user_id).first_or_404()
-    return render_template("account/edit_category3.html", product=product)
+    return _edit_item(3, product_id)
 
 
 @account_bp.route("/category3/<int:product_id>/edit", methods=["POST"])
 @login_required
 def update_category3(product_id):
     """Update Category3 product"""
-    user_id = session["user_id"]
-    product = Category3Product.query.filter_by(id=product_id, user_id=user_id).first_or_404()
-    
-    form = request.form
-    
-    try:
-        product.product_name = form.get("product_name", "")[:255]
-        product.product_origin_country = form.get("product_origin_country", "")[:100]
-        product.description = form.get("description", "")[:2000]
-        product.base_price = float(form.get("base_price", 0))
-        product.discount_percent = float(form.get("discount_percent", 0))
-        product.stock_quantity = int(form.get("stock_quantity", 0))
-        product.image_url = form.get("image_url", "")[:500]
-        
-        if product.admin_status == "approved":
-            product.admin_status = "pending"
-        
-        product.updated_at = datetime.utcnow()
-        
-        db.session.commit()
-        flash("Product updated successfully", "success")
-        return redirect(url_for("account.account"))
-    
-    except Exception as e:
-        db.session.rollback()
-        flash(f"Error updating product: {str(e)}", "error")
-        return redirect(url_for("account.edit_category3", product_id=product_id))
+    return _update_item(3, product_id)
 
 
 # ============================================
@@ -285,9 +305,12 @@ def update_category3(product_id):
 def delete_category1(listing_id):
     """Soft-delete Category1 listing"""
     user_id = session["user_id"]
-    listing = Category1Listing.query.filter_by(id=listing_id, user_id=user_id).first_or_404()
-    
-    listing.admin_status = "deleted"
+    # Single UPDATE ... WHERE id AND owner, no SELECT of the row
+    updated = Category1Listing.query.filter_by(id=listing_id, seller_id=user_id).update(
+        {"admin_status": "deleted"}, synchronize_session=False
+    )
+    if not updated:
+        abort(404)
     db.session.commit()
     
     flash("Listing deleted successfully", "success")
@@ -299,9 +322,12 @@ def delete_category1(listing_id):
 def delete_category2(listing_id):
     """Soft-delete Category2 listing"""
     user_id = session["user_id"]
-    listing = Category2Listing.query.filter_by(id=listing_id, user_id=user_id).first_or_404()
-    
-    listing.admin_status = "deleted"
+    # Single UPDATE ... WHERE id AND owner, no SELECT of the row
+    updated = Category2Listing.query.filter_by(id=listing_id, seller_id=user_id).update(
+        {"admin_status": "deleted"}, synchronize_session=False
+    )
+    if not updated:
+        abort(404)
     db.session.commit()
     
     flash("Listing deleted successfully", "success")
@@ -313,9 +339,12 @@ def delete_category2(listing_id):
 def delete_category3(product_id):
     """Soft-delete Category3 product"""
     user_id = session["user_id"]
-    product = Category3Product.query.filter_by(id=product_id, user_id=user_id).first_or_404()
-    
-    product.admin_status = "deleted"
+    # Single UPDATE ... WHERE id AND owner, no SELECT of the row
+    updated = Category3Product.query.filter_by(id=product_id, seller_id=user_id).update(
+        {"admin_status": "deleted"}, synchronize_session=False
+    )
+    if not updated:
+        abort(404)
     db.session.commit()
     
     flash("Product deleted successfully", "success")
@@ -326,90 +355,65 @@ def delete_category3(product_id):
 # PAYOUT DETAILS UPDATE
 # ============================================
 
+# Every payout column on User; all are cleared before the chosen method's fields are set
+PAYOUT_FIELDS = (
+    "bank_account_name", "bank_name", "bank_bsb_or_routing", "bank_account_number",
+    "mobile_banking_number", "payid_identifier",
+    "card_holder_name", "card_last4", "card_brand", "card_exp_month", "card_exp_year"
+)
+
+# Payout method -> (required form fields, error message when any are missing)
+PAYOUT_METHOD_FIELDS = {
+    "bank": (
+        ("bank_account_name", "bank_name", "bank_bsb_or_routing", "bank_account_number"),
+        "All bank account fields are required"
+    ),
+    "card": (
+        ("card_holder_name", "card_last4", "card_brand"),
+        "All card fields are required"
+    ),
+    "mobile_banking": (("mobile_banking_number",), "Mobile banking number is required"),
+    "payid": (("payid_identifier",), "PayID identifier is required"),
+    "none": ((), None),
+}
+
+
 @account_bp.route("/payout", methods=["POST"])
 @login_required
 def update_payout():
     """Update user payout details"""
     user_id = session["user_id"]
-    user = User.query.get(user_id)
     
     form = request.form
     payout_method = form.get("payout_method_type", "none")
     
+    # Validate everything up front so the failure paths never touch the session
+    if payout_method not in PAYOUT_METHOD_FIELDS:
+        flash("Invalid payout method", "error")
+        return redirect(url_for("account.account"))
+    
+    method_fields, error_message = PAYOUT_METHOD_FIELDS[payout_method]
+    values = {field: form.get(field, "").strip() for field in method_fields}
+    
+    if not all(values.values()):
+        flash(error_message, "error")
+        return redirect(url_for("account.account"))
+    
+    if payout_method == "card" and not (len(values["card_last4"]) == 4 and values["card_last4"].isdigit()):
+        flash("Card last 4 digits must be 4 numbers", "error")
+        return redirect(url_for("account.account"))
+    
+    # Clear every payout field, then overlay the chosen method's values
+    updates = dict.fromkeys(PAYOUT_FIELDS)
+    updates.update(values)
+    updates["payout_method_type"] = payout_method
+    
     try:
-        user.payout_method_type = payout_method
-        
-        if payout_method == "bank":
-            if not all([form.get("bank_account_name"), form.get("bank_name"),
-                       form.get("bank_bsb_or_routing"), form.get("bank_account_number")]):
-                flash("All bank account fields are required", "error")
-                return redirect(url_for("account.account"))
-            
-            user.bank_account_name = form.get("bank_account_name")
-            user.bank_name = form.get("bank_name")
-            user.bank_bsb_or_routing = form.get("bank_bsb_or_routing")
-            user.bank_account_number = form.get("bank_account_number")
-            user.mobile_banking_number = None
-            user.payid_identifier = None
-            user.card_holder_name = None
-            user.card_last4 = None
-            user.card_brand = None
-        
-        elif payout_method == "card":
-            if not all([form.get("card_holder_name"), form.get("card_last4"), form.get("card_brand")]):
-                flash("All card fields are required", "error")
-                return redirect(url_for("account.account"))
-            
-            user.card_holder_name = form.get("card_holder_name")
-            user.card_last4 = form.get("card_last4")
-            user.card_brand = form.get("card_brand")
-            user.bank_account_name = None
-            user.bank_name = None
-            user.bank_bsb_or_routing = None
-            user.bank_account_number = None
-            user.mobile_banking_number = None
-            user.payid_identifier = None
-        
-        elif payout_method == "mobile_banking":
-            if not form.get("mobile_banking_number"):
-                flash("Mobile banking number is required", "error")
-                return redirect(url_for("account.account"))
-            
-            user.mobile_banking_number = form.get("mobile_banking_number")
-            user.bank_account_name = None
-            user.bank_name = None
-            user.bank_bsb_or_routing = None
-            user.bank_account_number = None
-            user.payid_identifier = None
-            user.card_holder_name = None
-            user.card_last4 = None
-            user.card_brand = None
-        
-        elif payout_method == "payid":
-            if not form.get("payid_identifier"):
-                flash("PayID identifier is required", "error")
-                return redirect(url_for("account.account"))
-            
-            user.payid_identifier = form.get("payid_identifier")
-            user.bank_account_name = None
-            user.bank_name = None
-            user.bank_bsb_or_routing = None
-            user.bank_account_number = None
-            user.mobile_banking_number = None
-            user.card_holder_name = None
-            user.card_last4 = None
-            user.card_brand = None
-        
-        elif payout_method == "none":
-            user.bank_account_name = None
-            user.bank_name = None
-            user.bank_bsb_or_routing = None
-            user.bank_account_number = None
-            user.mobile_banking_number = None
-            user.payid_identifier = None
-            user.card_holder_name = None
-            user.card_last4 = None
-            user.card_brand = None
+        # Single UPDATE, no need to load the user row
+        updated = User.query.filter_by(id=user_id).update(updates, synchronize_session=False)
+        if not updated:
+            flash("User not found", "error")
+            return redirect(url_for("main.index"))
         
         db.session.commit()
         flash("Payout details updated successfully", "success")
@@ -433,11 +437,15 @@ def verify_handover(buyer_info_id):
     GET: Show verification form
     POST: Process code verification
     """
-    buyer_info = Category1BuyerInfo.query.get_or_404(buyer_info_id)
-    listing = Category1Listing.query.get_or_404(buyer_info.listing_id)
+    user_id = session["user_id"]
+    
+    # Fetch order + listing in a single round trip
+    buyer_info, listing = db.session.query(Category1BuyerInfo, Category1Listing).join(
+        Category1Listing, Category1Listing.id == Category1BuyerInfo.listing_id
+    ).filter(Category1BuyerInfo.id == buyer_info_id).first_or_404()
     
     # Verify seller owns this listing
-    if listing.user_id != session["user_id"]:
+    if listing.seller_id != user_id:
         flash("Unauthorized access", "error")
         return redirect(url_for("account.sales_dashboard"))
     
@@ -460,17 +468,18 @@ def verify_handover(buyer_info_id):
     if not entered_code:
         return jsonify({"error": "Handover code is required"}), 400
     
-    # Verify code matches
-    if entered_code != buyer_info.handover_code.upper():
-        # Increment attempts
+    # Verify code matches (constant-time compare)
+    stored_code = buyer_info.handover_code or ""  # stored uppercase by generate_handover_code()
+    if not hmac.compare_digest(entered_code.encode(), stored_code.encode()):
+        # Increment attempts (and dispute on the last one) in a single commit
         buyer_info.handover_attempts += 1
-        db.session.commit()
-        
         remaining = 5 - buyer_info.handover_attempts
         
         if remaining <= 0:
             buyer_info.status = 'disputed'
-            db.session.commit()
+        db.session.commit()
+        
+        if remaining <= 0:
             return jsonify({"error": "Maximum attempts exceeded. Order marked as disputed"}), 400
         
         return jsonify({"error": f"Invalid code. {remaining} attempts remaining"}), 400
@@ -499,11 +508,15 @@ def verify_delivery(buyer_info_id):
     GET: Show verification form
     POST: Process code verification
     """
-    buyer_info = Category1BuyerInfo.query.get_or_404(buyer_info_id)
-    listing = Category1Listing.query.get_or_404(buyer_info.listing_id)
+    user_id = session["user_id"]
+    
+    # Fetch order + listing in a single round trip
+    buyer_info, listing = db.session.query(Category1BuyerInfo, Category1Listing).join(
+        Category1Listing, Category1Listing.id == Category1BuyerInfo.listing_id
+    ).filter(Category1BuyerInfo.id == buyer_info_id).first_or_404()
     
     # Verify seller owns this listing
-    if listing.user_id != session["user_id"]:
+    if listing.seller_id != user_id:
         flash("Unauthorized access", "error")
         return redirect(url_for("account.sales_dashboard"))
     
@@ -526,17 +539,18 @@ def verify_delivery(buyer_info_id):
     if not entered_code:
         return jsonify({"error": "Delivery code is required"}), 400
     
-    # Verify code matches
-    if entered_code != buyer_info.delivery_code.upper():
-        # Increment attempts
+    # Verify code matches (constant-time compare)
+    stored_code = buyer_info.delivery_code or ""  # stored uppercase by generate_delivery_code()
+    if not hmac.compare_digest(entered_code.encode(), stored_code.encode()):
+        # Increment attempts (and dispute on the last one) in a single commit
         buyer_info.delivery_attempts += 1
-        db.session.commit()
-        
         remaining = 5 - buyer_info.delivery_attempts
         
         if remaining <= 0:
             buyer_info.status = 'disputed'
-            db.session.commit()
+        db.session.commit()
+        
+        if remaining <= 0:
             return jsonify({"error": "Maximum attempts exceeded. Order marked as disputed"}), 400
         
         return jsonify({"error": f"Invalid code. {remaining} attempts remaining"}), 400
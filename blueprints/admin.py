@@ -3,21 +3,42 @@ Admin blueprint for Maa Express
 Handles admin dashboard, manual payment verification, user management, and listing approvals
 """
 
-from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify, flash
+from flask import (
+    Blueprint, render_template, session, redirect, url_for, request, jsonify, flash, abort,
+    current_app, Response, stream_with_context
+)
+import csv
+import io
 from functools import wraps
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from collections import defaultdict, namedtuple
+from datetime import datetime, date, timedelta, time
 from decimal import Decimal
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, case, event, exists, text, literal, union_all
+from sqlalchemy.orm import Session, joinedload, load_only, raiseload
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from flask_caching import make_template_fragment_key
 
 from models import (
     db, User, Category1Listing, Category2Listing, Category3Product,
-    SiteVisit, UserLoginLog, Category1BuyerInfo
+    SiteVisit, SiteVisitRollup, DailyStats, UserLoginLog, Category1BuyerInfo, CATEGORY1_STATUSES
 )
 
+from extensions import cache
+from blueprints.auth_utils import clear_admin_session, user_profile, invalidate_user_profiles
 from utils.payment_utils import generate_handover_code, generate_delivery_code
+from blueprints.category1 import invalidate_listing_details
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
+# Runs the independent per-table dashboard counts in parallel
+_stats_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="admin-stats")
+
+# Accepted status/form values, built once at import instead of per request
+CAT1_STATUSES = frozenset(CATEGORY1_STATUSES)
+CAT23_STATUSES = frozenset(("pending", "approved", "rejected"))
+
 
 # ============================================
 # ADMIN AUTHENTICATION DECORATOR
@@ -31,8 +52,10 @@ def admin_required(f):
             flash("Please login to access admin panel", "error")
             return redirect(url_for("auth.login_page"))
         
-        user = User.query.get(session["user_id"])
-        if not user or not user.is_admin:
+        # ✅ Cached profile instead of a SELECT per page; toggle_admin/toggle_active commits evict it
+        profile = user_profile(session["user_id"])
+        if not profile or not profile["is_admin"] or not profile["is_active"]:
+            clear_admin_session()
             flash("Admin access required", "error")
             return redirect(url_for("main.index"))
         
@@ -44,66 +67,180 @@ def admin_required(f):
 # ADMIN DASHBOARD
 # ============================================
 
-@admin_bp.route("/")
-@admin_required
-def dashboard():
-    """Admin dashboard with pending manual payments"""
-    # User statistics
-    total_users = User.query.count()
-    active_users = User.query.filter_by(is_active=True).count()
-    admin_users = User.query.filter_by(is_admin=True).count()
-
-    # Category 1 statistics
-    cat1_total = Category1Listing.query.count()
-    cat1_pending = Category1Listing.query.filter_by(admin_status="pending").count()
-    cat1_approved = Category1Listing.query.filter_by(admin_status="approved").count()
-    cat1_rejected = Category1Listing.query.filter_by(admin_status="rejected").count()
-
-    # Category 2 statistics
-    cat2_total = Category2Listing.query.count()
-    cat2_pending = Category2Listing.query.filter_by(admin_status="pending").count()
-    cat2_approved = Category2Listing.query.filter_by(admin_status="approved").count()
-    cat2_rejected = Category2Listing.query.filter_by(admin_status="rejected").count()
-
-    # Category 3 statistics
-    cat3_total = Category3Product.query.count()
-    cat3_pending = Category3Product.query.filter_by(admin_status="pending").count()
-    cat3_approved = Category3Product.query.filter_by(admin_status="approved").count()
-    cat3_rejected = Category3Product.query.filter_by(admin_status="rejected").count()
-    
-    # ✅ PENDING MANUAL PAYMENTS COUNT
-    pending_manual_payments = Category1BuyerInfo.query.filter_by(
-        payment_status="manual_pay"
-    ).count()
+def _count_where(condition):
+    """COUNT of rows matching condition, usable alongside other aggregates"""
+    return func.count(case((condition, 1)))
+
+
+def _status_counts(model):
+    """Return (total, pending, approved, rejected) for a listing model from one GROUP BY"""
+    counts = dict(db.session.query(
+        model.admin_status,
+        func.count(model.id)
+    ).group_by(model.admin_status).all())
+    return (
+        sum(counts.values()),
+        counts.get("pending", 0),
+        counts.get("approved", 0),
+        counts.get("rejected", 0)
+    )
 
-    # Site visit statistics
-    total_visits = SiteVisit.query.count()
-    today = datetime.utcnow().date()
-    today_visits = SiteVisit.query.filter(
-        SiteVisit.visited_at >= datetime(today.year, today.month, today.day)
-    ).count()
 
-    # Login statistics
-    days = 7
-    cutoff = datetime.utcnow() - timedelta(days=days)
-    logins_last_n = UserLoginLog.query.filter(UserLoginLog.login_time >= cutoff).count()
+def _status_counts_in_app(app, model):
+    """Run _status_counts in a worker thread with its own app context (and session)"""
+    with app.app_context():
+        return tuple(_status_counts(model))
 
-    # Top pages
-    top_pages = db.session.query(
-        SiteVisit.page_url,
-        func.count(SiteVisit.id).label('visit_count')
-    ).group_by(SiteVisit.page_url).order_by(desc('visit_count')).limit(10).all()
 
-    # Recent users
-    recent_users = User.query.order_by(User.created_at.desc()).limit(10).all()
+# Cache key for the dashboard aggregates; delete it after writes that change them
+DASHBOARD_CACHE_KEY = "admin_dashboard_stats"
+DASHBOARD_LOGIN_DAYS = 7
 
-    # Pending items for quick access
-    pending_cat1 = Category1Listing.query.filter_by(admin_status="pending").limit(20).all()
-    pending_cat2 = Category2Listing.query.filter_by(admin_status="pending").limit(20).all()
-    pending_cat3 = Category3Product.query.filter_by(admin_status="pending").limit(20).all()
+# {% cache %} fragments in the dashboard includes that render those aggregates
+DASHBOARD_FRAGMENTS = ("admin_user_stats", "admin_top_pages")
 
-    return render_template(
-        "dashboard.html",
+
+def _invalidate_dashboard_cache():
+    """Drop cached dashboard aggregates and the HTML fragments rendered from them"""
+    cache.delete_many(
+        DASHBOARD_CACHE_KEY,
+        *(make_template_fragment_key(name) for name in DASHBOARD_FRAGMENTS)
+    )
+
+
+def _invalidate_user_dropdown():
+    """Drop the memoized owner <select> options"""
+    cache.delete_memoized(_user_dropdown)
+
+
+# Cached data -> the models whose writes make it stale. Visits and login logs are left
+# to the dashboard TTL, otherwise every page view would evict the cache.
+_CACHE_DEPENDENCIES = (
+    (_invalidate_dashboard_cache, (User, Category1Listing, Category2Listing, Category3Product, Category1BuyerInfo)),
+    (_invalidate_user_dropdown, (User,)),
+    (invalidate_user_profiles, (User,)),
+    (invalidate_listing_details, (User, Category1Listing)),
+)
+
+
+def _mark_stale(session, is_affected):
+    """Remember which caches the session's pending transaction will make stale"""
+    for invalidate, models in _CACHE_DEPENDENCIES:
+        if is_affected(models):
+            session.info.setdefault("stale_caches", set()).add(invalidate)
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_stale_caches_on_flush(session, flush_context):
+    """Check flushed objects against the cache dependencies"""
+    touched = list(chain(session.new, session.dirty, session.deleted))
+    _mark_stale(session, lambda models: any(isinstance(obj, models) for obj in touched))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_stale_caches_on_bulk_write(orm_execute_state):
+    """Check Query.update()/delete() targets against the cache dependencies"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        _mark_stale(orm_execute_state.session, lambda models: issubclass(mapper.class_, models))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale_caches(session):
+    """Drop stale caches once the transaction that changed their data has committed"""
+    for invalidate in session.info.pop("stale_caches", ()):
+        invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_stale_caches(session):
+    """Rolled-back writes never reached the database; nothing to invalidate"""
+    session.info.pop("stale_caches", None)
+
+
+# Visit aggregates are only time-driven: they have their own longer TTL and are not
+# dropped by the listing/user write invalidation above
+VISIT_STATS_TIMEOUT = 300
+
+
+def _approx_row_count(model):
+    """InnoDB's table_rows estimate from information_schema (metadata read, no scan)"""
+    if db.engine.dialect.name != "mysql":
+        return None
+    return db.session.execute(
+        text(
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = :table"
+        ),
+        {"table": model.__tablename__}
+    ).scalar()
+
+
+@cache.memoize(timeout=VISIT_STATS_TIMEOUT)
+def _total_visits():
+    """Approximate site_visits row count; a headline number, so the estimate is enough"""
+    approx = _approx_row_count(SiteVisit)
+    if approx is None:
+        return db.session.query(func.count(SiteVisit.id)).scalar()
+    return approx
+
+
+@cache.memoize(timeout=VISIT_STATS_TIMEOUT)
+def _top_pages():
+    """Ten most visited pages as (page_url, visit_count) tuples, from the rollup table"""
+    rows = db.session.query(
+        SiteVisitRollup.page_url,
+        SiteVisitRollup.visit_count
+    ).order_by(SiteVisitRollup.visit_count.desc()).limit(10).all()
+    return [tuple(row) for row in rows]
+
+
+@cache.cached(timeout=60, key_prefix=DASHBOARD_CACHE_KEY)
+def _dashboard_stats():
+    """
+    Aggregate counters for the admin dashboard.
+    Only plain values are returned so the result is safe to cache across requests.
+    """
+    # One clock read for every time window below
+    now = datetime.utcnow()
+    today_start = datetime.combine(now.date(), time.min)
+    cutoff = now - timedelta(days=DASHBOARD_LOGIN_DAYS)
+
+    # User statistics plus the manual-payment and recent-login counts (one round trip)
+    pending_payments_q = db.session.query(func.count(Category1BuyerInfo.id)).filter(
+        Category1BuyerInfo.payment_status == "manual_pay"
+    ).scalar_subquery()
+    recent_logins_q = db.session.query(func.count(UserLoginLog.id)).filter(
+        UserLoginLog.login_time >= cutoff
+    ).scalar_subquery()
+    total_users, active_users, admin_users, pending_manual_payments, logins_last_n = db.session.query(
+        func.count(User.id),
+        _count_where(User.is_active.is_(True)),
+        _count_where(User.is_admin.is_(True)),
+        pending_payments_q,
+        recent_logins_q
+    ).one()
+
+    # Category statistics (one scan per table, the three tables queried concurrently)
+    app = current_app._get_current_object()
+    futures = [
+        _stats_executor.submit(_status_counts_in_app, app, model)
+        for model in (Category1Listing, Category2Listing, Category3Product)
+    ]
+    (
+        (cat1_total, cat1_pending, cat1_approved, cat1_rejected),
+        (cat2_total, cat2_pending, cat2_approved, cat2_rejected),
+        (cat3_total, cat3_pending, cat3_approved, cat3_rejected),
+    ) = [future.result() for future in futures]
+    
+    # Site visit statistics (today is an index range; the full-table total is cached separately)
+    today_visits = db.session.query(func.count(SiteVisit.id)).filter(
+        SiteVisit.created_at >= today_start
+    ).scalar()
+
+    return dict(
         total_users=total_users,
         active_users=active_users,
         admin_users=admin_users,
@@ -120,15 +257,49 @@ def dashboard():
         cat3_approved=cat3_approved, 
         cat3_rejected=cat3_rejected,
         pending_manual_payments=pending_manual_payments,
+        total_visits=_total_visits(),
+        today_visits=today_visits,
+        logins_last_n=logins_last_n,
+        top_pages=_top_pages(),
+        login_days=DASHBOARD_LOGIN_DAYS
+    )
+
+
+@admin_bp.route("/")
+@admin_required
+def dashboard():
+    """Admin dashboard with pending manual payments"""
+    # Recent users (only the columns the dashboard shows)
+    recent_users = User.query.options(
+        load_only(User.id, User.email, User.full_name, User.created_at)
+    ).order_by(User.created_at.desc()).limit(10).all()
+
+    # Pending items for quick access
+    pending_cat1 = Category1Listing.query.options(
+        load_only(
+            Category1Listing.id,
+            Category1Listing.title,
+            Category1Listing.origin,
+            Category1Listing.destination,
+            Category1Listing.travel_date,
+            Category1Listing.price_per_kg,
+            Category1Listing.total_weight
+        ),
+        raiseload("*")
+    ).filter_by(admin_status="pending").limit(20).all()
+    pending_cat2 = Category2Listing.query.options(raiseload("*")).filter_by(admin_status="pending").limit(20).all()
+    pending_cat3 = Category3Product.query.options(
+        load_only(Category3Product.id, Category3Product.product_name, Category3Product.price),
+        raiseload("*")
+    ).filter_by(admin_status="pending").limit(20).all()
+
+    return render_template(
+        "dashboard.html",
         recent_users=recent_users,
         pending_cat1=pending_cat1,
         pending_cat2=pending_cat2,
         pending_cat3=pending_cat3,
-        total_visits=total_visits,
-        today_visits=today_visits,
-        logins_last_n=logins_last_n,
-        top_pages=top_pages,
-        login_days=days
+        **_dashboard_stats()
     )
 
 
@@ -140,7 +311,11 @@ def dashboard():
 @admin_required
 def pending_payments():
     """Show all pending manual payments"""
-    pending = Category1BuyerInfo.query.filter_by(
+    # Listing and buyer are rendered per row - load them in the same query
+    pending = Category1BuyerInfo.query.options(
+        joinedload(Category1BuyerInfo.listing),
+        joinedload(Category1BuyerInfo.buyer)
+    ).filter_by(
         payment_status="manual_pay"
     ).order_by(Category1BuyerInfo.created_at.desc()).all()
     
@@ -154,7 +329,10 @@ def pending_payments():
 @admin_required
 def verify_payment(buyer_info_id):
     """Admin verifies manual payment and generates codes"""
-    buyer_info = Category1BuyerInfo.query.get_or_404(buyer_info_id)
+    buyer_info = Category1BuyerInfo.query.options(
+        joinedload(Category1BuyerInfo.listing),
+        joinedload(Category1BuyerInfo.buyer)
+    ).filter_by(id=buyer_info_id).first_or_404()
     
     if request.method == "GET":
         return render_template(
@@ -210,23 +388,40 @@ def verify_payment(buyer_info_id):
 # USER MANAGEMENT
 # ============================================
 
+USERS_PER_PAGE = 50
+
 @admin_bp.route("/users")
 @admin_required
 def users():
     """User management page"""
-    days = int(request.args.get("days", 7))
+    days = request.args.get("days", 7, type=int)
+    page = request.args.get("page", 1, type=int)
     cutoff = datetime.utcnow() - timedelta(days=days)
-    users_list = User.query.order_by(User.created_at.desc()).all()
 
-    user_stats = []
-    for u in users_list:
-        login_count = UserLoginLog.query.filter(
-            UserLoginLog.user_id == u.id,
+    pagination = User.query.order_by(User.created_at.desc()).paginate(
+        page=page, per_page=USERS_PER_PAGE, error_out=False
+    )
+    page_user_ids = [u.id for u in pagination.items]
+
+    # Login counts for this page's users only, in one GROUP BY
+    login_counts = {}
+    if page_user_ids:
+        login_counts = dict(db.session.query(
+            UserLoginLog.user_id,
+            func.count(UserLoginLog.id)
+        ).filter(
+            UserLoginLog.user_id.in_(page_user_ids),
             UserLoginLog.login_time >= cutoff
-        ).count()
-        user_stats.append((u, login_count))
+        ).group_by(UserLoginLog.user_id).all())
 
-    return render_template("admin/users.html", user_stats=user_stats, login_days=days)
+    user_stats = [(u, login_counts.get(u.id, 0)) for u in pagination.items]
+
+    return render_template(
+        "admin/users.html",
+        user_stats=user_stats,
+        pagination=pagination,
+        login_days=days
+    )
 
 
 @admin_bp.post("/users/<int:user_id>/toggle-admin")
@@ -265,86 +460,245 @@ def toggle_active(user_id):
 # CATEGORY 1 - ADMIN LISTING MANAGEMENT
 # ============================================
 
+def _update_admin_status(model, item_id, new_status):
+    """Set admin_status with one UPDATE ... WHERE id = ? and commit; returns rows matched"""
+    # rowcount is rows *matched* (SQLAlchemy's MySQL dialects connect with CLIENT_FOUND_ROWS),
+    # so re-applying the current status is still a hit and only a missing id yields 0 -> 404
+    updated = model.query.filter_by(id=item_id).update(
+        {"admin_status": new_status}, synchronize_session=False
+    )
+    db.session.commit()
+    return updated
+
+
+# Owner <select> option; a tuple pickles far smaller than a dict per user
+UserChoice = namedtuple("UserChoice", ("id", "email", "full_name"))
+
+
+@cache.memoize(timeout=300)
+def _user_dropdown():
+    """
+    Users for the owner <select> on admin forms, as plain tuples so they can be cached.
+    Invalidated after any committed User write (see _CACHE_DEPENDENCIES).
+    """
+    rows = db.session.query(User.id, User.email, User.full_name).order_by(User.email).all()
+    return [UserChoice(*row) for row in rows]
+
+
+def _user_exists(user_id):
+    """EXISTS check for a user id, without loading the row"""
+    return db.session.query(exists().where(User.id == user_id)).scalar()
+
+
+LISTINGS_PER_PAGE = 25
+LISTINGS_MAX_PER_PAGE = 100
+
+
+# One page of an admin listing plus the cursor for the next (older) page
+KeysetPage = namedtuple("KeysetPage", ("items", "next_after_id", "per_page"))
+
+
+def _paginate_listings(q, id_column):
+    """
+    Newest-first page of an admin listing query, continuing below ?after_id=.
+    Keyset on the primary key: no OFFSET scan and no COUNT(*) however deep the admin pages.
+    """
+    per_page = min(max(request.args.get("per_page", LISTINGS_PER_PAGE, type=int), 1), LISTINGS_MAX_PER_PAGE)
+    after_id = request.args.get("after_id", type=int)
+    if after_id:
+        q = q.filter(id_column < after_id)
+
+    # Fetch one extra row to learn whether an older page exists
+    items = q.order_by(id_column.desc()).limit(per_page + 1).all()
+    next_after_id = items[per_page - 1].id if len(items) > per_page else None
+    return KeysetPage(items[:per_page], next_after_id, per_page)
+
+
 @admin_bp.route("/category1")
 @admin_required
 def category1_listings():
     """View all Category 1 listings"""
     status_filter = request.args.get("status", "all")
-    q = Category1Listing.query.order_by(Category1Listing.created_at.desc())
+    # Seller email is shown per row: join it in, and make any other lazy load raise
+    q = Category1Listing.query.options(
+        joinedload(Category1Listing.seller).load_only(User.id, User.email, User.full_name),
+        raiseload("*")
+    )
     
-    if status_filter in {"pending", "approved", "rejected", "deleted", "sold", "refunded"}:
+    if status_filter in CAT1_STATUSES:
         q = q.filter_by(admin_status=status_filter)
     
-    listings = q.all()
+    pagination = _paginate_listings(q, Category1Listing.id)
     return render_template(
         "admin/category1_listings.html", 
-        listings=listings, 
+        listings=pagination.items, 
+        pagination=pagination,
         status_filter=status_filter
     )
 
 
+# Columns written by the category 1 CSV export, in output order
+CATEGORY1_EXPORT_COLUMNS = (
+    Category1Listing.id, Category1Listing.seller_id, Category1Listing.title,
+    Category1Listing.origin, Category1Listing.destination, Category1Listing.travel_date,
+    Category1Listing.currency, Category1Listing.price_per_kg, Category1Listing.total_weight,
+    Category1Listing.discount_percent, Category1Listing.admin_status, Category1Listing.created_at
+)
+EXPORT_BATCH_SIZE = 500
+
+
+@admin_bp.route("/category1/export.csv")
+@admin_required
+def export_category1_listings():
+    """Stream Category 1 listings as CSV, fetched in batches so memory stays flat"""
+    status_filter = request.args.get("status", "all")
+    q = db.session.query(*CATEGORY1_EXPORT_COLUMNS).order_by(Category1Listing.id)
+    
+    if status_filter in CAT1_STATUSES:
+        q = q.filter(Category1Listing.admin_status == status_filter)
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([column.key for column in CATEGORY1_EXPORT_COLUMNS])
+        for row in q.yield_per(EXPORT_BATCH_SIZE):
+            writer.writerow(row)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=category1_listings.csv"}
+    )
+
+
+# Admin create form schema: field -> (converter, required). Built once at import.
+CATEGORY1_CREATE_FIELDS = {
+    "user_id": (int, True),
+    "title": (str, True),
+    "description": (str, False),
+    "service_type": (str, False),
+    "origin": (str, True),
+    "origin_airport": (str, True),
+    "origin_delivery_location": (str, False),
+    "origin_delivery_postcode": (str, False),
+    "destination": (str, True),
+    "destination_airport": (str, True),
+    "destination_delivery_location": (str, False),
+    "destination_delivery_postcode": (str, False),
+    "travel_date": (date.fromisoformat, True),
+    "currency": (str, False),
+    "price_per_kg": (Decimal, True),
+    "total_weight": (Decimal, True),
+    "discount_percent": (Decimal, False),
+    "passport_photo_url": (str, False),
+    "ticket_copy_url": (str, False),
+}
+
+
+# Edit form: these keep their stored value when left blank...
+# (the owner <select> posts `user_id`; _parse_edit_form writes it to seller_id)
+CATEGORY1_EDIT_FIELDS = {
+    "user_id": (int, False),
+    "title": (str, False),
+    "service_type": (str, False),
+    "origin": (str, False),
+    "origin_airport": (str, False),
+    "destination": (str, False),
+    "destination_airport": (str, False),
+    "travel_date": (date.fromisoformat, False),
+    "currency": (str, False),
+    "price_per_kg": (Decimal, False),
+    "total_weight": (Decimal, False),
+    "discount_percent": (Decimal, False),
+}
+
+# ...and these are overwritten with whatever was submitted
+CATEGORY1_CLEARABLE_FIELDS = {
+    "description": "",
+    "origin_delivery_location": None,
+    "origin_delivery_postcode": None,
+    "destination_delivery_location": None,
+    "destination_delivery_postcode": None,
+    "passport_photo_url": None,
+    "ticket_copy_url": None,
+}
+
+
+def _parse_form(form, fields):
+    """Convert submitted values against a field schema; returns (values, error message)"""
+    values = {}
+    for name, (convert, required) in fields.items():
+        raw = form.get(name)
+        if not raw:
+            if required:
+                return None, f"Missing required field: {name}"
+            continue
+        try:
+            values[name] = convert(raw)
+        except (ValueError, ArithmeticError):
+            return None, f"Invalid value for {name}"
+    return values, None
+
+
+def _parse_edit_form(form, fields, clearable):
+    """
+    Changed columns for an admin edit: blank `fields` keep their stored value,
+    `clearable` fields are written as submitted (falling back to their default).
+    """
+    values, error = _parse_form(form, fields)
+    if error:
+        return None, error
+    values.update({name: form.get(name, default) for name, default in clearable.items()})
+
+    # Owner is only reassigned to a user that exists
+    owner_id = values.pop("user_id", None)
+    if owner_id is not None and _user_exists(owner_id):
+        values["seller_id"] = owner_id
+    return values, None
+
+
+def _apply_edit(model, item_id, values):
+    """Write an admin edit as one UPDATE ... WHERE id = ? (no SELECT) and commit; returns rows matched"""
+    updated = model.query.filter_by(id=item_id).update(values, synchronize_session=False)
+    db.session.commit()
+    return updated
+
+
 @admin_bp.route("/category1/new", methods=["GET", "POST"])
 @admin_required
 def create_category1_listing():
     """Admin creates a new Category 1 listing on behalf of a user"""
     if request.method == "GET":
-        users = User.query.order_by(User.email).all()
+        users = _user_dropdown()
         return render_template("admin/category1_new.html", users=users)
 
     # POST - create listing
-    form = request.form
-    required_fields = (
-        "user_id", "title", "origin", "origin_airport", "destination", 
-        "destination_airport", "travel_date", "price_per_kg", "total_weight"
-    )
-    
-    for field in required_fields:
-        if not form.get(field):
-            flash(f"Missing required field: {field}", "error")
-            return redirect(url_for("admin.create_category1_listing"))
+    values, error = _parse_form(request.form, CATEGORY1_CREATE_FIELDS)
+    if error:
+        flash(error, "error")
+        return redirect(url_for("admin.create_category1_listing"))
 
-    try:
-        user_id = int(form.get("user_id"))
-        travel_date = datetime.strptime(form.get("travel_date"), "%Y-%m-%d").date()
-        price_per_kg = Decimal(form.get("price_per_kg"))
-        total_weight = Decimal(form.get("total_weight"))
-        discount = Decimal(form.get("discount_percent") or "0")
-        admin_status = form.get("admin_status", "pending")
-        
-        # ✅ VALIDATE admin_status matches MySQL enum
-        valid_statuses = {"pending", "approved", "rejected", "deleted", "sold", "refunded"}
-        if admin_status not in valid_statuses:
-            admin_status = "pending"
+    # ✅ VALIDATE admin_status matches MySQL enum
+    admin_status = request.form.get("admin_status", "pending")
+    if admin_status not in CAT1_STATUSES:
+        admin_status = "pending"
 
+    try:
         # Validate user exists
-        user = User.query.get(user_id)
-        if not user:
+        seller_id = values.pop("user_id")
+        if not _user_exists(seller_id):
             flash("Invalid user selected", "error")
             return redirect(url_for("admin.create_category1_listing"))
 
-        listing = Category1Listing(
-            user_id=user_id,
-            title=form.get("title"),
-            description=form.get("description"),
-            service_type=form.get("service_type", "Included pick up at Origin and delivery at Destination."),
-            origin=form.get("origin"),
-            origin_airport=form.get("origin_airport"),
-            origin_delivery_location=form.get("origin_delivery_location"),
-            origin_delivery_postcode=form.get("origin_delivery_postcode"),
-            destination=form.get("destination"),
-            destination_airport=form.get("destination_airport"),
-            destination_delivery_location=form.get("destination_delivery_location"),
-            destination_delivery_postcode=form.get("destination_delivery_postcode"),
-            travel_date=travel_date,
-            currency=form.get("currency", "AUD"),
-            price_per_kg=price_per_kg,
-            total_weight=total_weight,
-            discount_percent=discount,
-            passport_photo_url=form.get("passport_photo_url"),
-            ticket_copy_url=form.get("ticket_copy_url"),
-            admin_status=admin_status,
-            admin_note=form.get("admin_note")
-        )
+        values.setdefault("service_type", "Included pick up at Origin and delivery at Destination.")
+        values.setdefault("currency", "AUD")
+        values.setdefault("discount_percent", Decimal("0"))
+        listing = Category1Listing(seller_id=seller_id, admin_status=admin_status, **values)
         
         db.session.add(listing)
         db.session.commit()
@@ -362,106 +716,92 @@ def create_category1_listing():
 @admin_required
 def edit_category1_listing(listing_id):
     """Admin edits an existing Category 1 listing"""
-    listing = Category1Listing.query.get_or_404(listing_id)
-
     if request.method == "GET":
-        users = User.query.order_by(User.email).all()
+        listing = Category1Listing.query.get_or_404(listing_id)
+        users = _user_dropdown()
         return render_template("admin/category1_edit.html", listing=listing, users=users)
 
-    # POST - update listing
-    form = request.form
-    
-    try:
-        # Update user if changed
-        if form.get("user_id"):
-            new_user_id = int(form.get("user_id"))
-            if User.query.get(new_user_id):
-                listing.user_id = new_user_id
-
-        # Update all fields
-        listing.title = form.get("title") or listing.title
-        listing.description = form.get("description", "")
-        listing.service_type = form.get("service_type") or listing.service_type
-        listing.origin = form.get("origin") or listing.origin
-        listing.origin_airport = form.get("origin_airport") or listing.origin_airport
-        listing.origin_delivery_location = form.get("origin_delivery_location")
-        listing.origin_delivery_postcode = form.get("origin_delivery_postcode")
-        listing.destination = form.get("destination") or listing.destination
-        listing.destination_airport = form.get("destination_airport") or listing.destination_airport
-        listing.destination_delivery_location = form.get("destination_delivery_location")
-        listing.destination_delivery_postcode = form.get("destination_delivery_postcode")
-        
-        if form.get("travel_date"):
-            listing.travel_date = datetime.strptime(form.get("travel_date"), "%Y-%m-%d").date()
-        
-        if form.get("currency"):
-            listing.currency = form.get("currency")
-        
-        if form.get("price_per_kg"):
-            listing.price_per_kg = Decimal(form.get("price_per_kg"))
-        
-        if form.get("total_weight"):
-            listing.total_weight = Decimal(form.get("total_weight"))
-        
-        if form.get("discount_percent"):
-            listing.discount_percent = Decimal(form.get("discount_percent"))
-        
-        listing.passport_photo_url = form.get("passport_photo_url")
-        listing.ticket_copy_url = form.get("ticket_copy_url")
-        listing.admin_note = form.get("admin_note")
-        
-        # ✅ VALIDATE admin_status matches MySQL enum
-        if form.get("admin_status") in {"pending", "approved", "rejected", "deleted", "sold", "refunded"}:
-            listing.admin_status = form.get("admin_status")
+    # POST - update listing with only the columns the form sets
+    values, error = _parse_edit_form(request.form, CATEGORY1_EDIT_FIELDS, CATEGORY1_CLEARABLE_FIELDS)
+    if error:
+        flash(f"❌ Invalid input: {error}", "error")
+        return redirect(url_for("admin.edit_category1_listing", listing_id=listing_id))
 
-        listing.updated_at = datetime.utcnow()
-        db.session.commit()
-        
-        flash(f"✅ Listing {listing_id} updated successfully", "success")
-        return redirect(url_for("admin.category1_listings"))
+    # ✅ VALIDATE admin_status matches MySQL enum
+    if request.form.get("admin_status") in CAT1_STATUSES:
+        values["admin_status"] = request.form["admin_status"]
 
-    except ValueError as e:
-        flash(f"❌ Invalid input: {str(e)}", "error")
-        return redirect(url_for("admin.edit_category1_listing", listing_id=listing_id))
+    try:
+        updated = _apply_edit(Category1Listing, listing_id, values)
     except Exception as e:
         db.session.rollback()
         flash(f"❌ Error updating listing: {str(e)}", "error")
         return redirect(url_for("admin.edit_category1_listing", listing_id=listing_id))
 
+    if not updated:
+        abort(404)
+
+    flash(f"✅ Listing {listing_id} updated successfully", "success")
+    return redirect(url_for("admin.category1_listings"))
+
 
 @admin_bp.post("/category1/<int:listing_id>/update-status")
 @admin_required
 def update_category1_status(listing_id):
     """Update approval status of a Category 1 listing"""
-    listing = Category1Listing.query.get_or_404(listing_id)
     new_status = request.form.get("status")
     
     # ✅ VALIDATE against MySQL enum
-    if new_status not in {"pending", "approved", "rejected", "deleted", "sold", "refunded"}:
+    if new_status not in CAT1_STATUSES:
         return "Invalid status", 400
     
-    listing.admin_status = new_status
-    db.session.commit()
+    # Single UPDATE, no SELECT
+    if not _update_admin_status(Category1Listing, listing_id, new_status):
+        abort(404)
     
     flash(f"✅ Listing {listing_id} status updated to {new_status}", "success")
     return redirect(url_for("admin.category1_listings"))
 
 
+@admin_bp.post("/category1/bulk-update-status")
+@admin_required
+def bulk_update_category1_status():
+    """Set the approval status of several Category 1 listings in one UPDATE"""
+    ids = request.form.getlist("ids", type=int)
+    new_status = request.form.get("status")
+    
+    if new_status not in CAT1_STATUSES:
+        return "Invalid status", 400
+    
+    if not ids:
+        flash("No listings selected", "error")
+        return redirect(url_for("admin.category1_listings"))
+    
+    updated = Category1Listing.query.filter(Category1Listing.id.in_(ids)).update(
+        {"admin_status": new_status}, synchronize_session=False
+    )
+    db.session.commit()
+    
+    flash(f"✅ {updated} listing(s) updated to {new_status}", "success")
+    return redirect(url_for("admin.category1_listings"))
+
+
 @admin_bp.post("/category1/<int:listing_id>/delete")
 @admin_required
 def delete_category1_listing(listing_id):
     """Admin soft-deletes a Category 1 listing"""
-    listing = Category1Listing.query.get_or_404(listing_id)
-    
     try:
-        # Soft delete by setting admin_status to 'deleted'
-        listing.admin_status = "deleted"
-        db.session.commit()
-        flash(f"✅ Listing {listing_id} marked as deleted", "success")
+        # Soft delete by setting admin_status to 'deleted' (single UPDATE, no SELECT)
+        updated = _update_admin_status(Category1Listing, listing_id, "deleted")
     except Exception as e:
         db.session.rollback()
         flash(f"❌ Error deleting listing: {str(e)}", "error")
+        return redirect(url_for("admin.category1_listings"))
+    
+    if not updated:
+        abort(404)
     
+    flash(f"✅ Listing {listing_id} marked as deleted", "success")
     return redirect(url_for("admin.category1_listings"))
 
 
@@ -474,85 +814,77 @@ def delete_category1_listing(listing_id):
 def category2_listings():
     """View all Category 2 listings"""
     status_filter = request.args.get("status", "all")
-    q = Category2Listing.query.order_by(Category2Listing.created_at.desc())
+    q = Category2Listing.query.options(raiseload("*"))
     
-    if status_filter in {"pending", "approved", "rejected"}:
+    if status_filter in CAT23_STATUSES:
         q = q.filter_by(admin_status=status_filter)
     
-    listings = q.all()
+    pagination = _paginate_listings(q, Category2Listing.id)
     return render_template(
         "admin/category2_listings.html", 
-        listings=listings, 
+        listings=pagination.items, 
+        pagination=pagination,
         status_filter=status_filter
     )
 
 
+CATEGORY2_EDIT_FIELDS = {
+    "user_id": (int, False),
+    "title": (str, False),
+    "origin": (str, False),
+    "destination": (str, False),
+    "travel_date": (date.fromisoformat, False),
+    "price": (Decimal, False),
+}
+
+CATEGORY2_CLEARABLE_FIELDS = {
+    "description": "",
+}
+
+
 @admin_bp.route("/category2/<int:listing_id>/edit", methods=["GET", "POST"])
 @admin_required
 def edit_category2_listing(listing_id):
     """Admin edits an existing Category 2 listing"""
-    listing = Category2Listing.query.get_or_404(listing_id)
-
     if request.method == "GET":
-        users = User.query.order_by(User.email).all()
+        listing = Category2Listing.query.get_or_404(listing_id)
+        users = _user_dropdown()
         return render_template("admin/category2_edit.html", listing=listing, users=users)
 
-    # POST - update listing
-    form = request.form
-    
-    try:
-        if form.get("user_id"):
-            new_user_id = int(form.get("user_id"))
-            if User.query.get(new_user_id):
-                listing.user_id = new_user_id
-
-        listing.name = form.get("name") or listing.name
-        listing.description = form.get("description", "")
-        
-        if form.get("gender") in {"male", "female", "other"}:
-            listing.gender = form.get("gender")
-        
-        listing.travel_from = form.get("travel_from")
-        listing.travel_to = form.get("travel_to")
-        
-        if form.get("travel_date"):
-            listing.travel_date = datetime.strptime(form.get("travel_date"), "%Y-%m-%d").date()
-        
-        if form.get("price"):
-            listing.price = Decimal(form.get("price"))
-        
-        if form.get("discount_percent"):
-            listing.discount_percent = Decimal(form.get("discount_percent"))
-        
-        listing.image_url = form.get("image_url")
-        
-        if form.get("admin_status") in {"pending", "approved", "rejected"}:
-            listing.admin_status = form.get("admin_status")
+    # POST - update listing with only the columns the form sets
+    values, error = _parse_edit_form(request.form, CATEGORY2_EDIT_FIELDS, CATEGORY2_CLEARABLE_FIELDS)
+    if error:
+        flash(f"❌ Invalid input: {error}", "error")
+        return redirect(url_for("admin.edit_category2_listing", listing_id=listing_id))
 
-        listing.updated_at = datetime.utcnow()
-        db.session.commit()
-        
-        flash(f"✅ Category 2 listing {listing_id} updated successfully", "success")
-        return redirect(url_for("admin.category2_listings"))
+    if request.form.get("admin_status") in CAT23_STATUSES:
+        values["admin_status"] = request.form["admin_status"]
 
+    try:
+        updated = _apply_edit(Category2Listing, listing_id, values)
     except Exception as e:
         db.session.rollback()
         flash(f"❌ Error updating listing: {str(e)}", "error")
         return redirect(url_for("admin.edit_category2_listing", listing_id=listing_id))
 
+    if not updated:
+        abort(404)
+
+    flash(f"✅ Category 2 listing {listing_id} updated successfully", "success")
+    return redirect(url_for("admin.category2_listings"))
+
 
 @admin_bp.post("/category2/<int:listing_id>/update-status")
 @admin_required
 def update_category2_status(listing_id):
     """Update approval status of a Category 2 listing"""
-    listing = Category2Listing.query.get_or_404(listing_id)
     new_status = request.form.get("status")
     
-    if new_status not in {"pending", "approved", "rejected"}:
+    if new_status not in CAT23_STATUSES:
         return "Invalid status", 400
     
-    listing.admin_status = new_status
-    db.session.commit()
+    if not _update_admin_status(Category2Listing, listing_id, new_status):
+        abort(404)
     
     flash(f"✅ Category 2 listing {listing_id} status updated to {new_status}", "success")
     return redirect(url_for("admin.category2_listings"))
@@ -567,81 +899,78 @@ def update_category2_status(listing_id):
 def category3_products():
     """View all Category 3 products"""
     status_filter = request.args.get("status", "all")
-    q = Category3Product.query.order_by(Category3Product.created_at.desc())
+    q = Category3Product.query.options(raiseload("*"))
     
-    if status_filter in {"pending", "approved", "rejected"}:
+    if status_filter in CAT23_STATUSES:
         q = q.filter_by(admin_status=status_filter)
     
-    products = q.all()
+    pagination = _paginate_listings(q, Category3Product.id)
     return render_template(
         "admin/category3_products.html", 
-        products=products, 
+        products=pagination.items, 
+        pagination=pagination,
         status_filter=status_filter
     )
 
 
+CATEGORY3_EDIT_FIELDS = {
+    "user_id": (int, False),
+    "product_name": (str, False),
+    "price": (Decimal, False),
+    "currency": (str, False),
+}
+
+CATEGORY3_CLEARABLE_FIELDS = {
+    "description": "",
+    "product_origin_country": None,
+    "authenticity_proof_url": None,
+    "image_url": None,
+}
+
+
 @admin_bp.route("/category3/<int:product_id>/edit", methods=["GET", "POST"])
 @admin_required
 def edit_category3_product(product_id):
     """Admin edits an existing Category 3 product"""
-    product = Category3Product.query.get_or_404(product_id)
-
     if request.method == "GET":
-        users = User.query.order_by(User.email).all()
+        product = Category3Product.query.get_or_404(product_id)
+        users = _user_dropdown()
         return render_template("admin/category3_edit.html", product=product, users=users)
 
-    # POST - update product
-    form = request.form
-    
-    try:
-        if form.get("user_id"):
-            new_user_id = int(form.get("user_id"))
-            if User.query.get(new_user_id):
-                product.user_id = new_user_id
-
-        product.product_name = form.get("product_name") or product.product_name
-        product.product_origin_country = form.get("product_origin_country")
-        product.description = form.get("description", "")
-        
-        if form.get("price"):
-            product.price = Decimal(form.get("price"))
-        
-        if form.get("discount_percent"):
-            product.discount_percent = Decimal(form.get("discount_percent"))
-        
-        if form.get("stock"):
-            product.stock = int(form.get("stock"))
-        
-        product.authenticity_proof_url = form.get("authenticity_proof_url")
-        product.image_url = form.get("image_url")
-        
-        if form.get("admin_status") in {"pending", "approved", "rejected"}:
-            product.admin_status = form.get("admin_status")
+    # POST - update product with only the columns the form sets
+    values, error = _parse_edit_form(request.form, CATEGORY3_EDIT_FIELDS, CATEGORY3_CLEARABLE_FIELDS)
+    if error:
+        flash(f"❌ Invalid input: {error}", "error")
+        return redirect(url_for("admin.edit_category3_product", product_id=product_id))
 
-        product.updated_at = datetime.utcnow()
-        db.session.commit()
-        
-        flash(f"✅ Category 3 product {product_id} updated successfully", "success")
-        return redirect(url_for("admin.category3_products"))
+    if request.form.get("admin_status") in CAT23_STATUSES:
+        values["admin_status"] = request.form["admin_status"]
 
+    try:
+        updated = _apply_edit(Category3Product, product_id, values)
     except Exception as e:
         db.session.rollback()
         flash(f"❌ Error updating product: {str(e)}", "error")
         return redirect(url_for("admin.edit_category3_product", product_id=product_id))
 
+    if not updated:
+        abort(404)
+
+    flash(f"✅ Category 3 product {product_id} updated successfully", "success")
+    return redirect(url_for("admin.category3_products"))
+
 
 @admin_bp.post("/category3/<int:product_id>/update-status")
 @admin_required
 def update_category3_status(product_id):
     """Update approval status of a Category 3 product"""
-    product = Category3Product.query.get_or_404(product_id)
     new_status = request.form.get("status")
     
-    if new_status not in {"pending", "approved", "rejected"}:
+    if new_status not in CAT23_STATUSES:
         return "Invalid status", 400
     
-    product.admin_status = new_status
-    db.session.commit()
+    if not _update_admin_status(Category3Product, product_id, new_status):
+        abort(404)
     
     flash(f"✅ Category 3 product {product_id} status updated to {new_status}", "success")
     return redirect(url_for("admin.category3_products"))
@@ -651,54 +980,123 @@ def update_category3_status(product_id):
 # ANALYTICS & SETTINGS
 # ============================================
 
-@admin_bp.route("/analytics")
-@admin_required
-def analytics():
-    """Analytics dashboard"""
-    days = int(request.args.get("days", 30))
-    cutoff = datetime.utcnow() - timedelta(days=days)
+# Timestamp columns behind the three daily series, in DailyStats column order
+_DAILY_SERIES = (
+    (SiteVisit.created_at, SiteVisit.id),
+    (UserLoginLog.login_time, UserLoginLog.id),
+    (User.created_at, User.id),
+)
 
-    # Daily visits
-    daily_visits = db.session.query(
-        func.date(SiteVisit.visited_at).label('date'),
-        func.count(SiteVisit.id).label('count')
-    ).filter(
-        SiteVisit.visited_at >= cutoff
-    ).group_by('date').order_by('date').all()
 
-    # Daily logins
-    daily_logins = db.session.query(
-        func.date(UserLoginLog.login_time).label('date'),
-        func.count(UserLoginLog.id).label('count')
-    ).filter(
-        UserLoginLog.login_time >= cutoff
-    ).group_by('date').order_by('date').all()
+def _daily_counts(start, end=None):
+    """{date: [visits, logins, registrations]} for days in [start, end), aggregated live from the raw tables"""
+    # One UNION ALL of the three per-table GROUP BYs, tagged with their series index.
+    # Filter and group on DATE(col) itself so the planner can use the *_day expression indexes.
+    selects = []
+    for index, (column, id_column) in enumerate(_DAILY_SERIES):
+        day = func.date(column)
+        stmt = db.select(
+            literal(index).label("series"),
+            day.label("day"),
+            func.count(id_column).label("total")
+        ).where(day >= start)
+        if end is not None:
+            stmt = stmt.where(day < end)
+        selects.append(stmt.group_by(day))
+
+    counts = defaultdict(lambda: [0, 0, 0])
+    for series, day, total in db.session.execute(union_all(*selects)):
+        counts[day][series] = total
+    return counts
+
+
+def rollup_daily_stats(days=1):
+    """Recompute DailyStats for the last `days` complete UTC days (cron: flask rollup-daily-stats)"""
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=days)
+    counts = _daily_counts(first_day, today)
+
+    rows = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        visits, logins, registrations = counts.get(day, (0, 0, 0))
+        rows.append(dict(date=day, visits=visits, logins=logins, registrations=registrations))
+
+    # One multi-row INSERT ... ON DUPLICATE KEY UPDATE instead of a SELECT + write per day
+    now = datetime.utcnow()
+    upsert = mysql_insert(DailyStats).values([dict(row, updated_at=now) for row in rows])
+    db.session.execute(upsert.on_duplicate_key_update(
+        visits=upsert.inserted.visits,
+        logins=upsert.inserted.logins,
+        registrations=upsert.inserted.registrations,
+        updated_at=now
+    ))
+    db.session.commit()
+
 
-    # Daily registrations
-    daily_registrations = db.session.query(
-        func.date(User.created_at).label('date'),
-        func.count(User.id).label('count')
+@cache.memoize(timeout=300)
+def _analytics_stats(days):
+    """
+    Daily series and most active users for the analytics page.
+    Memoized per days value; the data is visit/login driven so it simply expires.
+    """
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=days)
+    cutoff = datetime.combine(first_day, time.min)
+
+    # Completed days come from the rollup table; only days it does not cover yet
+    # (today, or a missed cron run) are aggregated from the raw tables
+    series = {
+        row.date: [row.visits, row.logins, row.registrations]
+        for row in DailyStats.query.filter(DailyStats.date >= first_day, DailyStats.date < today)
+    }
+    live_from = max(series) + timedelta(days=1) if series else first_day
+    series.update(_daily_counts(live_from))
+
+    days_in_order = sorted(series)
+    daily_visits, daily_logins, daily_registrations = (
+        [(day, series[day][index]) for day in days_in_order if series[day][index]]
+        for index in range(len(_DAILY_SERIES))
+    )
+
+    # Most active users: rank on the narrow login table first, then join just the top 10 users
+    top_logins = db.session.query(
+        UserLoginLog.user_id,
+        func.count(UserLoginLog.id).label('login_count')
     ).filter(
-        User.created_at >= cutoff
-    ).group_by('date').order_by('date').all()
+        UserLoginLog.login_time >= cutoff
+    ).group_by(UserLoginLog.user_id).order_by(desc('login_count')).limit(10).subquery()
 
-    # Most active users
     active_users = db.session.query(
         User.id,
         User.full_name,
         User.email,
-        func.count(UserLoginLog.id).label('login_count')
-    ).join(UserLoginLog).filter(
-        UserLoginLog.login_time >= cutoff
-    ).group_by(User.id, User.full_name, User.email).order_by(desc('login_count')).limit(10).all()
+        top_logins.c.login_count
+    ).join(top_logins, top_logins.c.user_id == User.id).order_by(top_logins.c.login_count.desc()).all()
 
-    return render_template(
-        "admin/analytics.html",
-        days=days,
+    return dict(
         daily_visits=daily_visits,
         daily_logins=daily_logins,
         daily_registrations=daily_registrations,
-        active_users=active_users
+        active_users=[tuple(row) for row in active_users]
+    )
+
+
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 365
+
+
+@admin_bp.route("/analytics")
+@admin_required
+def analytics():
+    """Analytics dashboard"""
+    # Clamped so malformed values fall back to the default and the memoized keys stay bounded
+    days = min(max(request.args.get("days", ANALYTICS_DEFAULT_DAYS, type=int), 1), ANALYTICS_MAX_DAYS)
+
+    return render_template(
+        "admin/analytics.html",
+        days=days,
+        **_analytics_stats(days)
     )
 
 
@@ -1,10 +1,17 @@
 from flask import Blueprint, request, jsonify, session, redirect, url_for
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
 from models import db, User, UserLoginLog
-from functools import wraps
+from blueprints.auth_utils import (
+    get_current_user, stamp_admin_session, clear_admin_session,
+    hash_password, verify_password, user_profile,
+)
 import phonenumbers
+from functools import lru_cache
 
 
+# ✅ Pure function of two short strings; bounded so junk input can't grow it without limit
+@lru_cache(maxsize=8192)
 def normalize_phone_e164(phone_str, default_region="AU"):
     """
     Normalize phone number to E.164 format.
@@ -23,15 +30,6 @@ def normalize_phone_e164(phone_str, default_region="AU"):
 auth_bp = Blueprint("auth", __name__)
 
 
-def login_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if "user_id" not in session:
-            return redirect(url_for("auth.login_page"))
-        return f(*args, **kwargs)
-    return decorated
-
-
 @auth_bp.route("/register")
 def register_page():
     """Redirect to register template"""
@@ -44,9 +42,8 @@ def login_page():
     return redirect(url_for("main.render_template_name", template="login.html"))
 
 
-# ✅ FIXED: Register both /api/* and /auth/api/* routes
+# Root-level /api/* aliases are added in create_app() via app.add_url_rule
 @auth_bp.route("/api/register", methods=["POST"])
-@auth_bp.route("/../api/register", methods=["POST"])  # Also register at root /api/register
 def api_register():
     """
     Register a new user account.
@@ -75,14 +72,13 @@ def api_register():
     if not normalized_phone:
         return jsonify({"error": "Invalid phone number format. Use format: +61412345678"}), 400
 
-    # Check for duplicate email
-    existing_email = User.query.filter_by(email=email).first()
-    if existing_email:
-        return jsonify({"error": "Email already registered"}), 400
-
-    # Check for duplicate phone
-    existing_phone = User.query.filter_by(phone=normalized_phone).first()
-    if existing_phone:
+    # Check for duplicate email or phone in one lookup
+    existing = db.session.query(User.email, User.phone).filter(
+        or_(User.email == email, User.phone == normalized_phone)
+    ).first()
+    if existing:
+        if existing.email == email:
+            return jsonify({"error": "Email already registered"}), 400
         return jsonify({"error": "Phone number already registered"}), 400
 
     # Create new user
@@ -91,27 +87,27 @@ def api_register():
             full_name=full_name,
             email=email,
             phone=normalized_phone,
-            password_hash=generate_password_hash(password),
+            password_hash=hash_password(password),
             is_admin=False,
             is_active=True,
             email_verified=True,
             phone_verified=True
         )
         db.session.add(user)
-        db.session.commit()
-
-        # Auto-login after registration
-        session["user_id"] = user.id
+        db.session.flush()  # ✅ Assigns user.id without ending the transaction
 
-        # Log the registration as a login event
-        log = UserLoginLog(
+        # Log the registration as a login event (same commit as the user row)
+        db.session.add(UserLoginLog(
             user_id=user.id,
             ip_address=request.remote_addr,
             user_agent=request.headers.get("User-Agent")
-        )
-        db.session.add(log)
+        ))
         db.session.commit()
 
+        # Auto-login after registration
+        session["user_id"] = user.id
+        stamp_admin_session(user)
+
         return jsonify({
             "message": "Registration successful",
             "user": {
@@ -122,13 +118,16 @@ def api_register():
             }
         }), 201
 
+    except IntegrityError:
+        # ✅ Lost a race with a concurrent signup: the unique keys on email/phone caught it
+        db.session.rollback()
+        return jsonify({"error": "Email or phone number already registered"}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Registration failed: {str(e)}"}), 500
 
 
 @auth_bp.route("/api/login", methods=["POST"])
-@auth_bp.route("/../api/login", methods=["POST"])  # Also register at root /api/login
 def api_login():
     """
     Login with email/phone and password.
@@ -151,7 +150,7 @@ def api_login():
             user = User.query.filter_by(phone=normalized_phone).first()
 
     # Verify credentials
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user or not verify_password(user, password):
         return jsonify({"error": "Invalid credentials"}), 401
 
     # Check if account is active
@@ -160,14 +159,14 @@ def api_login():
 
     # Set session
     session["user_id"] = user.id
+    stamp_admin_session(user)
 
-    # Log the login
-    log = UserLoginLog(
+    # Log the login (plain INSERT, no ORM object to track or refresh)
+    db.session.execute(insert(UserLoginLog).values(
         user_id=user.id,
         ip_address=request.remote_addr,
         user_agent=request.headers.get("User-Agent")
-    )
-    db.session.add(log)
+    ))
     db.session.commit()
 
     return jsonify({
@@ -182,10 +181,10 @@ def api_login():
 
 
 @auth_bp.route("/api/logout", methods=["POST"])
-@auth_bp.route("/../api/logout", methods=["POST"])  # Also register at root /api/logout
 def api_logout():
     """Logout current user by clearing session"""
     session.pop("user_id", None)
+    clear_admin_session()
     return jsonify({"message": "Logged out successfully"}), 200
 
 
@@ -211,7 +210,7 @@ def api_verify_phone():
     if "user_id" not in session:
         return jsonify({"error": "Not authenticated"}), 401
     
-    user = User.query.get(session["user_id"])
+    user = get_current_user()
     if not user:
         return jsonify({"error": "User not found"}), 404
     
@@ -225,16 +224,9 @@ def api_verify_phone():
 def check_session():
     """Check if user is logged in"""
     if "user_id" in session:
-        user = User.query.get(session["user_id"])
-        if user:
-            return jsonify({
-                "logged_in": True,
-                "user": {
-                    "id": user.id,
-                    "full_name": user.full_name,
-                    "email": user.email,
-                    "is_admin": user.is_admin
-                }
-            }), 200
+        # ✅ Heartbeat polls answer from the server-side profile cache, not a User SELECT each time
+        profile = user_profile(session["user_id"])
+        if profile:
+            return jsonify({"logged_in": True, "user": profile}), 200
     
-    return jsonify({"logged_in": False}), 200
\ No newline at end of file
+    return jsonify({"logged_in": False}), 200
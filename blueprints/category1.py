@@ -1,13 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, flash
-from functools import wraps
+from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, flash, abort
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 import os
+import hmac
+from functools import lru_cache
 from werkzeug.utils import secure_filename
+from sqlalchemy import select, exists
+from sqlalchemy.orm import joinedload
 from config import Config
 
 from models import db, Category1Listing, User, Category1BuyerInfo
-from utils.phone_utils import can_view_full_phone
+from extensions import cache
+from blueprints.auth_utils import login_required, get_current_user
 from utils.payment_utils import (
     generate_handover_code,
     generate_delivery_code,
@@ -26,22 +30,70 @@ category1_bp = Blueprint("category1", __name__, url_prefix="/category1")
 # Maximum file upload size (5MB)
 MAX_FILE_SIZE = 5 * 1024 * 1024
 
-# Allowed file extensions for proof photos
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'pdf'}  # ✅ Added PDF for ID documents
+# Listing cards per marketplace page
+MARKETPLACE_PER_PAGE = 24
 
+# Approved listings' detail-page fields are cached this long (and dropped on any listing/user commit)
+LISTING_DETAIL_TIMEOUT = 60
+
+# Listing columns the public detail page renders
+LISTING_DETAIL_FIELDS = (
+    "id", "seller_id", "title", "description", "service_type", "travel_date",
+    "origin", "origin_airport", "origin_delivery_location", "origin_phone_number",
+    "destination", "destination_airport", "destination_delivery_location", "destination_phone_number",
+    "currency", "price_per_kg", "total_weight", "discount_percent",
+)
+
+# Fields each create-wizard step must fill in (the final submit needs all of them)
+WIZARD_STEP_FIELDS = {
+    1: ("travel_date", "service_type", "origin", "origin_airport", "destination", "destination_airport"),
+    2: ("currency", "price_per_kg", "total_weight"),
+    3: ("origin_phone_number",),
+}
+LISTING_REQUIRED_FIELDS = tuple(field for fields in WIZARD_STEP_FIELDS.values() for field in fields)
+
+PURCHASE_REQUIRED_FIELDS = (
+    "receiver_fullname",
+    "receiver_phone",
+    "receiver_email",
+    "delivery_address",
+    "delivery_postcode",
+    "delivery_country",
+    "purchased_weight",
+    "payment_method"
+)
 
-# ============================================================================
-# AUTHENTICATION DECORATOR
-# ============================================================================
-def login_required(f):
-    """Require user to be logged in"""
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if "user_id" not in session:
-            flash("Please log in to continue", "error")
-            return redirect(url_for("auth.login_page"))
-        return f(*args, **kwargs)
-    return decorated
+
+# Listing numeric bounds, parsed once
+MAX_PRICE_PER_KG = Decimal("10000")
+MAX_TOTAL_WEIGHT = Decimal("1000")
+MAX_DISCOUNT_PERCENT = Decimal("100")
+
+
+def _to_decimal(value):
+    """Decimal from a JSON value: strings parse directly, numbers go via str() to avoid float artefacts"""
+    return Decimal(value) if isinstance(value, str) else Decimal(str(value))
+
+
+def _missing_fields(data, fields):
+    """Names in `fields` that are absent or blank in `data`, in order"""
+    return [field for field in fields if not data.get(field)]
+
+
+# Listing currencies accepted by the create wizard, and the subset Stripe charges
+LISTING_CURRENCIES = frozenset(('AUD', 'USD', 'EUR', 'GBP', 'BDT', 'INR'))
+STRIPE_CURRENCIES = frozenset(('AUD', 'USD', 'EUR', 'GBP'))
+
+# Category1BuyerInfo.payment_method ENUM values (ordered for error messages)
+PAYMENT_METHODS = (
+    'PAYPAL', 'STRIPE', 'WISE',
+    'BANK_ACCOUNT', 'MOBILE_BANKING_BKASH_NAGAD',
+    'PAYID', 'BKASH_TO_BANK'
+)
+MANUAL_PAYMENT_METHODS = frozenset(('BANK_ACCOUNT', 'WISE', 'BKASH_TO_BANK', 'PAYID', 'MOBILE_BANKING_BKASH_NAGAD'))
+
+# Allowed file extensions for proof photos
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'pdf'}  # ✅ Added PDF for ID documents
 
 
 def allowed_file(filename):
@@ -49,6 +101,73 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+@lru_cache(maxsize=32)
+def _cached_url(endpoint, script_root):
+    """url_for() of an argument-free endpoint, built once per mount point instead of per response"""
+    return url_for(endpoint)
+
+
+def _fixed_url(endpoint):
+    """URL of an endpoint that takes no arguments (redirect targets, JSON redirect_url)"""
+    return _cached_url(endpoint, request.script_root)
+
+
+def _buyer_info_with_listing(buyer_info_id):
+    """Purchase row and its listing in one joined SELECT (404 if missing)"""
+    return Category1BuyerInfo.query.options(
+        joinedload(Category1BuyerInfo.listing)
+    ).filter_by(id=buyer_info_id).first_or_404()
+
+
+def _detail_seller_load():
+    """Join the seller columns the detail page shows into the listing SELECT"""
+    # Built per call: the `seller` backref only exists once the mappers are configured
+    return joinedload(Category1Listing.seller).load_only(User.id, User.full_name, User.email)
+
+
+@cache.memoize(timeout=LISTING_DETAIL_TIMEOUT)
+def _approved_listing_view(listing_id):
+    """Detail-page fields of an approved listing and its seller as plain dicts (None if not public)"""
+    listing = db.session.get(Category1Listing, listing_id, options=[_detail_seller_load()])
+    if listing is None or listing.admin_status != "approved":
+        return None
+    return _listing_view(listing)
+
+
+def _listing_view(listing):
+    """Plain-dict copy of the detail-page fields of a listing and its seller"""
+    view = {field: getattr(listing, field) for field in LISTING_DETAIL_FIELDS}
+    seller = listing.seller
+    view["seller"] = {"id": seller.id, "full_name": seller.full_name, "email": seller.email} if seller else None
+    return view
+
+
+def _approved_listing_with_access(listing_id, user_id):
+    """
+    Approved listing plus whether the user has a paid purchase on it, in one SELECT
+    (correlated EXISTS on the purchases table). Returns (view, seller_contact_visible) or None.
+    """
+    paid_purchase = exists().where(
+        Category1BuyerInfo.listing_id == Category1Listing.id,
+        Category1BuyerInfo.buyer_id == user_id,
+        Category1BuyerInfo.payment_status == "paid"
+    ).correlate(Category1Listing)
+
+    row = db.session.execute(
+        select(Category1Listing, paid_purchase.label("can_view"))
+        .options(_detail_seller_load())
+        .where(Category1Listing.id == listing_id, Category1Listing.admin_status == "approved")
+    ).first()
+    if row is None:
+        return None
+    return _listing_view(row.Category1Listing), bool(row.can_view)
+
+
+def invalidate_listing_details():
+    """Drop every memoized listing detail view"""
+    cache.delete_memoized(_approved_listing_view)
+
+
 # ============================================================================
 # PUBLIC ROUTES (NO AUTH REQUIRED)
 # ============================================================================
@@ -70,34 +189,42 @@ def marketplace():
     if filters['destination']:
         query = query.filter(Category1Listing.destination.ilike(f"%{filters['destination']}%"))
     if filters['date_from']:
-        query = query.filter(Category1Listing.travel_date >= datetime.strptime(filters['date_from'], '%Y-%m-%d').date())
+        query = query.filter(Category1Listing.travel_date >= date.fromisoformat(filters['date_from']))
     if filters['date_to']:
-        query = query.filter(Category1Listing.travel_date <= datetime.strptime(filters['date_to'], '%Y-%m-%d').date())
+        query = query.filter(Category1Listing.travel_date <= date.fromisoformat(filters['date_to']))
     
-    listings = query.order_by(Category1Listing.travel_date.asc()).all()
+    # One page of cards per request instead of every approved listing
+    pagination = query.order_by(Category1Listing.travel_date.asc(), Category1Listing.id).paginate(
+        page=request.args.get('page', 1, type=int),
+        per_page=MARKETPLACE_PER_PAGE,
+        error_out=False
+    )
     
-    return render_template("category1/marketplace.html", listings=listings, filters=filters)
+    return render_template(
+        "category1_marketplace.html",
+        listings=pagination.items,
+        pagination=pagination,
+        filters=filters
+    )
 
 
 @category1_bp.route("/<int:listing_id>")
 def detail(listing_id):
     """View single listing details (public)"""
-    listing = Category1Listing.query.filter_by(
-        id=listing_id, 
-        admin_status="approved"
-    ).first_or_404()
-    
     # ✅ UPDATED: Contact masking logic (only show if payment_status = 'paid')
-    seller_contact_visible = False
-    if 'user_id' in session:
-        # Check if current user has PAID purchase for this listing
-        paid_purchase = Category1BuyerInfo.query.filter_by(
-            listing_id=listing_id,
-            buyer_id=session['user_id'],
-            payment_status='paid'
-        ).first()
-        
-        seller_contact_visible = paid_purchase is not None
+    user_id = session.get('user_id')
+    if user_id:
+        # Listing and the paid-purchase check come back from the same SELECT
+        found = _approved_listing_with_access(listing_id, user_id)
+        if found is None:
+            abort(404)
+        listing, seller_contact_visible = found
+    else:
+        # ✅ Anonymous visitors: identity-map/PK lookup behind a short cache, evicted on commit
+        listing = _approved_listing_view(listing_id)
+        if listing is None:
+            abort(404)
+        seller_contact_visible = False
     
     return render_template(
         "category1_detail.html", 
@@ -136,9 +263,7 @@ def validate_step():
         
         if step == 1:
             # Validate travel details
-            required = ["travel_date", "service_type", "origin", "origin_airport", 
-                       "destination", "destination_airport"]
-            missing = [f for f in required if not data.get(f)]
+            missing = _missing_fields(data, WIZARD_STEP_FIELDS[1])
             
             if missing:
                 return jsonify({
@@ -148,8 +273,8 @@ def validate_step():
             
             # Validate travel date
             try:
-                travel_date = datetime.strptime(data["travel_date"], "%Y-%m-%d").date()
-                if travel_date <= datetime.now().date():
+                travel_date = date.fromisoformat(data["travel_date"])
+                if travel_date <= date.today():
                     return jsonify({
                         "valid": False,
                         "error": "Travel date must be tomorrow or later"
@@ -164,8 +289,7 @@ def validate_step():
         
         elif step == 2:
             # Validate pricing and documents
-            required = ["currency", "price_per_kg", "total_weight"]
-            missing = [f for f in required if not data.get(f)]
+            missing = _missing_fields(data, WIZARD_STEP_FIELDS[2])
             
             if missing:
                 return jsonify({
@@ -175,29 +299,29 @@ def validate_step():
             
             # Validate numeric fields
             try:
-                price_per_kg = Decimal(str(data["price_per_kg"]))
-                total_weight = Decimal(str(data["total_weight"]))
-                discount = Decimal(str(data.get("discount_percent", "0")))
+                price_per_kg = _to_decimal(data["price_per_kg"])
+                total_weight = _to_decimal(data["total_weight"])
+                discount = _to_decimal(data.get("discount_percent", "0"))
                 
-                if price_per_kg <= 0 or price_per_kg > 10000:
+                if price_per_kg <= 0 or price_per_kg > MAX_PRICE_PER_KG:
                     return jsonify({
                         "valid": False,
                         "error": "Price per kg must be between 0.01 and 10000"
                     }), 400
                 
-                if total_weight <= 0 or total_weight > 1000:
+                if total_weight <= 0 or total_weight > MAX_TOTAL_WEIGHT:
                     return jsonify({
                         "valid": False,
                         "error": "Total weight must be between 0.01 and 1000 kg"
                     }), 400
                 
-                if discount < 0 or discount > 100:
+                if discount < 0 or discount > MAX_DISCOUNT_PERCENT:
                     return jsonify({
                         "valid": False,
                         "error": "Discount must be between 0 and 100%"
                     }), 400
                 
-            except (ValueError, TypeError):
+            except (ValueError, TypeError, ArithmeticError):
                 return jsonify({
                     "valid": False,
                     "error": "Invalid numeric values"
@@ -207,8 +331,7 @@ def validate_step():
         
         elif step == 3:
             # Validate phone numbers
-            required = ["origin_phone_number"]
-            missing = [f for f in required if not data.get(f)]
+            missing = _missing_fields(data, WIZARD_STEP_FIELDS[3])
             
             if missing:
                 return jsonify({
@@ -235,35 +358,40 @@ def create_listing_submit():
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
+        # Every wizard field in one pass, reported together
+        missing = _missing_fields(data, LISTING_REQUIRED_FIELDS)
+        if missing:
+            return jsonify({"error": f"Missing: {', '.join(missing)}", "fields": missing}), 400
+        
         # Validate travel date
         try:
-            travel_date = datetime.strptime(data["travel_date"], "%Y-%m-%d").date()
+            travel_date = date.fromisoformat(data["travel_date"])
         except (ValueError, KeyError):
             return jsonify({"error": "Invalid travel date"}), 400
         
-        if travel_date <= datetime.now().date():
+        if travel_date <= date.today():
             return jsonify({"error": "Travel date must be tomorrow or later (no past or today dates allowed)"}), 400
         
         # Validate currency
         currency = data["currency"].upper()
-        if currency not in ['AUD', 'USD', 'EUR', 'GBP', 'BDT', 'INR']:
+        if currency not in LISTING_CURRENCIES:
             return jsonify({"error": "Invalid currency"}), 400
         
         # Validate numeric fields
         try:
-            price_per_kg = Decimal(str(data["price_per_kg"]))
-            total_weight = Decimal(str(data["total_weight"]))
-            discount_percent = Decimal(str(data.get("discount_percent", "0")))
-        except (ValueError, TypeError):
+            price_per_kg = _to_decimal(data["price_per_kg"])
+            total_weight = _to_decimal(data["total_weight"])
+            discount_percent = _to_decimal(data.get("discount_percent", "0"))
+        except (ValueError, TypeError, ArithmeticError):
             return jsonify({"error": "Invalid numeric values"}), 400
         
-        if price_per_kg <= 0 or price_per_kg > 10000:
+        if price_per_kg <= 0 or price_per_kg > MAX_PRICE_PER_KG:
             return jsonify({"error": "Price per kg must be between 0.01 and 10000"}), 400
         
-        if total_weight <= 0 or total_weight > 1000:
+        if total_weight <= 0 or total_weight > MAX_TOTAL_WEIGHT:
             return jsonify({"error": "Total weight must be between 0.01 and 1000 kg"}), 400
         
-        if discount_percent < 0 or discount_percent > 100:
+        if discount_percent < 0 or discount_percent > MAX_DISCOUNT_PERCENT:
             return jsonify({"error": "Discount must be between 0 and 100%"}), 400
         
         # Auto-generate title if not provided
@@ -318,7 +446,7 @@ def create_listing_submit():
             "success": True,
             "message": "Thank you for choosing Maa Express. Your listing has been submitted and is pending admin approval.",
             "listing_id": listing.id,
-            "redirect_url": url_for("account.account")
+            "redirect_url": _fixed_url("account.account")
         }), 201
         
     except Exception as e:
@@ -335,11 +463,11 @@ def create_listing_submit():
 @login_required
 def edit_listing(listing_id):
     """Show edit wizard"""
-    listing = Category1Listing.query.get_or_404(listing_id)
-    
-    if listing.seller_id != session["user_id"]:
-        flash("Unauthorized access", "error")
-        return redirect(url_for("account.account"))
+    # Ownership enforced in the WHERE clause - non-owners get a 404
+    listing = Category1Listing.query.filter_by(
+        id=listing_id,
+        seller_id=session["user_id"]
+    ).first_or_404()
     
     return render_template(
         "category1/listing_wizard.html",
@@ -354,10 +482,10 @@ def edit_listing(listing_id):
 @login_required
 def update_listing(listing_id):
     """Update listing"""
-    listing = Category1Listing.query.get_or_404(listing_id)
-    
-    if listing.seller_id != session["user_id"]:
-        return jsonify({"error": "Unauthorized"}), 403
+    listing = Category1Listing.query.filter_by(
+        id=listing_id,
+        seller_id=session["user_id"]
+    ).first_or_404()
     
     try:
         data = request.get_json()
@@ -373,21 +501,21 @@ def update_listing(listing_id):
         listing.destination_airport = data.get("destination_airport", listing.destination_airport)[:255]
         
         if "travel_date" in data:
-            listing.travel_date = datetime.strptime(data["travel_date"], "%Y-%m-%d").date()
+            listing.travel_date = date.fromisoformat(data["travel_date"])
         
         if "price_per_kg" in data:
-            listing.price_per_kg = Decimal(str(data["price_per_kg"]))
+            listing.price_per_kg = _to_decimal(data["price_per_kg"])
         if "total_weight" in data:
-            listing.total_weight = Decimal(str(data["total_weight"]))
+            listing.total_weight = _to_decimal(data["total_weight"])
         if "discount_percent" in data:
-            listing.discount_percent = Decimal(str(data["discount_percent"]))
+            listing.discount_percent = _to_decimal(data["discount_percent"])
         
         db.session.commit()
         
         return jsonify({
             "success": True,
             "message": "Listing updated successfully",
-            "redirect_url": url_for("account.account")
+            "redirect_url": _fixed_url("account.account")
         })
         
     except Exception as e:
@@ -399,12 +527,15 @@ def update_listing(listing_id):
 @login_required
 def delete_listing(listing_id):
     """Soft delete listing"""
-    listing = Category1Listing.query.get_or_404(listing_id)
+    # Single UPDATE ... WHERE id AND seller, no SELECT of the row
+    updated = Category1Listing.query.filter_by(
+        id=listing_id,
+        seller_id=session["user_id"]
+    ).update({"admin_status": "deleted"}, synchronize_session=False)
     
-    if listing.seller_id != session["user_id"]:
-        return jsonify({"success": False, "error": "Unauthorized"}), 403
+    if not updated:
+        abort(404)
     
-    listing.admin_status = "deleted"
     db.session.commit()
     
     return jsonify({"success": True, "message": "Listing deleted"})
@@ -462,18 +593,7 @@ def process_purchase(listing_id):
         data = request.get_json()
         
         # ✅ VALIDATE ALL REQUIRED FIELDS (as per requirements)
-        required_fields = [
-            "receiver_fullname", 
-            "receiver_phone", 
-            "receiver_email",
-            "delivery_address",
-            "delivery_postcode",
-            "delivery_country",
-            "purchased_weight",
-            "payment_method"
-        ]
-        
-        missing = [f for f in required_fields if not data.get(f)]
+        missing = _missing_fields(data, PURCHASE_REQUIRED_FIELDS)
         if missing:
             return jsonify({
                 "success": False,
@@ -482,28 +602,23 @@ def process_purchase(listing_id):
         
         # ✅ VALIDATE PAYMENT METHOD (exact MySQL enum values)
         payment_method = data["payment_method"].upper()
-        valid_payment_methods = [
-            'PAYPAL', 'STRIPE', 'WISE', 
-            'BANK_ACCOUNT', 'MOBILE_BANKING_BKASH_NAGAD', 
-            'PAYID', 'BKASH_TO_BANK'
-        ]
         
-        if payment_method not in valid_payment_methods:
+        if payment_method not in PAYMENT_METHODS:
             return jsonify({
                 "success": False,
-                "error": f"Invalid payment method. Must be one of: {', '.join(valid_payment_methods)}"
+                "error": f"Invalid payment method. Must be one of: {', '.join(PAYMENT_METHODS)}"
             }), 400
         
         # Validate purchased weight
         try:
-            purchased_weight = Decimal(str(data["purchased_weight"]))
-        except (ValueError, TypeError):
+            purchased_weight = _to_decimal(data["purchased_weight"])
+        except (ValueError, TypeError, ArithmeticError):
             return jsonify({
                 "success": False,
                 "error": "Invalid weight value"
             }), 400
         
-        if purchased_weight <= 0 or purchased_weight > float(listing.total_weight):
+        if purchased_weight <= 0 or purchased_weight > listing.total_weight:
             return jsonify({
                 "success": False,
                 "error": f"Weight must be between 0.01 and {listing.total_weight} kg"
@@ -537,7 +652,7 @@ def process_purchase(listing_id):
             note=data.get("note", "")[:1000] if data.get("note") else None,
             
             # Purchase details (exact field names from schema)
-            purchased_weight=Decimal(str(purchased_weight)),
+            purchased_weight=purchased_weight,
             purchase_price=Decimal(str(total_price)),
             
             # ✅ PAYMENT DETAILS (as per requirements)
@@ -598,24 +713,23 @@ def process_purchase(listing_id):
 @login_required
 def payment_page(buyer_info_id):
     """Show payment page"""
-    buyer_info = Category1BuyerInfo.query.get_or_404(buyer_info_id)
+    buyer_info = _buyer_info_with_listing(buyer_info_id)
     
     if buyer_info.buyer_id != session["user_id"]:
         flash("Unauthorized access", "error")
-        return redirect(url_for("main.index"))
+        return redirect(_fixed_url("main.index"))
     
     listing = buyer_info.listing
     total_amount = float(buyer_info.purchase_price)
     
     stripe_client_secret = None
     
-    if listing.currency.upper() in ['AUD', 'USD', 'EUR', 'GBP']:
+    if listing.currency.upper() in STRIPE_CURRENCIES:
         amount_cents = int(total_amount * 100)
         
-        from config import Config
-
         if Config.STRIPE_SECRET_KEY:
-            buyer = User.query.get(buyer_info.buyer_id)
+            # Buyer is the logged-in user (checked above): reuse the per-request user
+            buyer = get_current_user()
             intent = create_stripe_payment_intent(
                 amount_cents=amount_cents,
                 currency=listing.currency,
@@ -648,14 +762,7 @@ def process_payment(buyer_info_id):
         data = request.get_json()
         payment_method = data.get("payment_method", "").upper()
         
-        # ✅ FIXED: Include WISE in valid methods
-        valid_methods = [
-            'STRIPE', 'PAYPAL', 'WISE',
-            'BANK_ACCOUNT', 'BKASH_TO_BANK',
-            'PAYID', 'MOBILE_BANKING_BKASH_NAGAD'
-        ]
-        
-        if payment_method not in valid_methods:
+        if payment_method not in PAYMENT_METHODS:
             return jsonify({
                 "success": False,
                 "error": "Invalid payment method"
@@ -682,7 +789,7 @@ def process_payment(buyer_info_id):
         # MANUAL PAYMENT METHODS (BANK/WISE/BKASH/PAYID)
         # ============================================
         
-        elif payment_method in ['BANK_ACCOUNT', 'WISE', 'BKASH_TO_BANK', 'PAYID', 'MOBILE_BANKING_BKASH_NAGAD']:
+        elif payment_method in MANUAL_PAYMENT_METHODS:
             # Save receipt and reference
             buyer_info.payment_receipt_url = data.get("receipt_url", "")[:500]
             buyer_info.payment_reference = data.get("payment_reference", "")[:255]
@@ -694,7 +801,7 @@ def process_payment(buyer_info_id):
             return jsonify({
                 "success": True,
                 "message": "Payment submitted successfully. We will verify your payment within 24 hours.",
-                "redirect_url": url_for("account.account")
+                "redirect_url": _fixed_url("account.account")
             })
         
         # ============================================
@@ -742,12 +849,12 @@ def upload_documents(buyer_info_id):
     Upload luggage photo and sender ID after payment success.
     Only accessible if payment_status = 'paid'.
     """
-    buyer_info = Category1BuyerInfo.query.get_or_404(buyer_info_id)
+    buyer_info = _buyer_info_with_listing(buyer_info_id)
     
     # Security check
     if buyer_info.buyer_id != session["user_id"]:
         flash("Unauthorized access", "error")
-        return redirect(url_for("main.index"))
+        return redirect(_fixed_url("main.index"))
     
     # Must have paid
     if buyer_info.payment_status != "paid":
@@ -788,7 +895,7 @@ def upload_documents(buyer_info_id):
             buyer_info.delivery_code = generate_delivery_code()
         
         # ✅ UPDATE USER.user_ID (only if NULL)
-        buyer = User.query.get(buyer_info.buyer_id)
+        buyer = get_current_user()
         if buyer and (not buyer.user_ID or buyer.user_ID.strip() == ""):
             buyer.user_ID = sender_id_url[:500]
         
@@ -850,7 +957,7 @@ def stripe_return(buyer_info_id):
     
     if buyer_info.buyer_id != session["user_id"]:
         flash("Unauthorized access", "error")
-        return redirect(url_for("main.index"))
+        return redirect(_fixed_url("main.index"))
     
     # Get payment intent ID from query params
     payment_intent_id = request.args.get('payment_intent')
@@ -883,11 +990,16 @@ def stripe_return(buyer_info_id):
 @login_required
 def purchase_success(buyer_info_id):
     """Show purchase success page with handover/delivery codes"""
-    buyer_info = Category1BuyerInfo.query.get_or_404(buyer_info_id)
+    # Listing and the seller's contact columns come back in the same SELECT
+    buyer_info = Category1BuyerInfo.query.options(
+        joinedload(Category1BuyerInfo.listing)
+        .joinedload(Category1Listing.seller)
+        .load_only(User.id, User.full_name, User.email)
+    ).filter_by(id=buyer_info_id).first_or_404()
     
     if buyer_info.buyer_id != session["user_id"]:
         flash("Unauthorized access", "error")
-        return redirect(url_for("main.index"))
+        return redirect(_fixed_url("main.index"))
     
     if buyer_info.payment_status != "paid":
         flash("Payment not completed", "warning")
@@ -918,7 +1030,7 @@ def paypal_return(buyer_info_id):
     
     if buyer_info.buyer_id != session["user_id"]:
         flash("Unauthorized access", "error")
-        return redirect(url_for("main.index"))
+        return redirect(_fixed_url("main.index"))
     
     # Get PayPal order ID from query params
     paypal_order_id = request.args.get('token')
@@ -955,7 +1067,7 @@ def paypal_return(buyer_info_id):
 @login_required
 def verify_handover(buyer_info_id):
     """Seller verifies handover at origin"""
-    buyer_info = Category1BuyerInfo.query.get_or_404(buyer_info_id)
+    buyer_info = _buyer_info_with_listing(buyer_info_id)
     listing = buyer_info.listing
     
     # Check if current user is the seller
@@ -963,7 +1075,7 @@ def verify_handover(buyer_info_id):
         if request.method == "POST":
             return jsonify({"success": False, "error": "Unauthorized"}), 403
         flash("Unauthorized access", "error")
-        return redirect(url_for("account.account"))
+        return redirect(_fixed_url("account.account"))
     
     if request.method == "GET":
         # ✅ SHOW BUYER CONTACT (seller can see after payment_status='paid')
@@ -1010,8 +1122,9 @@ def verify_handover(buyer_info_id):
                 "error": "Handover code is required"
             }), 400
         
-        # Verify code
-        if entered_code == buyer_info.handover_code.upper():
+        # Verify code (constant-time compare)
+        stored_code = buyer_info.handover_code or ""  # stored uppercase by generate_handover_code()
+        if hmac.compare_digest(entered_code.encode(), stored_code.encode()):
             # Success
             buyer_info.handover_verified_at = datetime.utcnow()
             buyer_info.status = "in_transit"
@@ -1024,7 +1137,7 @@ def verify_handover(buyer_info_id):
                 })
             else:
                 flash("Handover verified successfully!", "success")
-                return redirect(url_for("account.sales_dashboard"))
+                return redirect(_fixed_url("account.sales_dashboard"))
         else:
             buyer_info.handover_attempts += 1
             db.session.commit()
@@ -1046,7 +1159,7 @@ def verify_handover(buyer_info_id):
 @login_required
 def verify_delivery(buyer_info_id):
     """Seller verifies delivery at destination"""
-    buyer_info = Category1BuyerInfo.query.get_or_404(buyer_info_id)
+    buyer_info = _buyer_info_with_listing(buyer_info_id)
     listing = buyer_info.listing
     
     # Check if current user is the seller
@@ -1054,7 +1167,7 @@ def verify_delivery(buyer_info_id):
         if request.method == "POST":
             return jsonify({"success": False, "error": "Unauthorized"}), 403
         flash("Unauthorized access", "error")
-        return redirect(url_for("account.account"))
+        return redirect(_fixed_url("account.account"))
     
     if request.method == "GET":
         # ✅ SHOW BUYER CONTACT (seller can see after payment_status='paid')
@@ -1101,8 +1214,9 @@ def verify_delivery(buyer_info_id):
                 "error": "Delivery code is required"
             }), 400
         
-        # Verify code
-        if entered_code == buyer_info.delivery_code.upper():
+        # Verify code (constant-time compare)
+        stored_code = buyer_info.delivery_code or ""  # stored uppercase by generate_delivery_code()
+        if hmac.compare_digest(entered_code.encode(), stored_code.encode()):
             # Success
             buyer_info.delivery_verified_at = datetime.utcnow()
             buyer_info.status = "delivered"
@@ -1115,7 +1229,7 @@ def verify_delivery(buyer_info_id):
                 })
             else:
                 flash("Delivery verified successfully!", "success")
-                return redirect(url_for("account.sales_dashboard"))
+                return redirect(_fixed_url("account.sales_dashboard"))
         else:
             buyer_info.delivery_attempts += 1
             db.session.commit()
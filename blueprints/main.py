@@ -1,37 +1,63 @@
-from flask import Blueprint, render_template, session, request
-from models import Category1Listing, Category2Listing, Category3Product, SiteVisit, User
-from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, current_app
+from werkzeug.local import LocalProxy
+from models import db, Category1Listing, Category2Listing, Category3Product, SiteVisit, SiteVisitRollup
+from datetime import datetime, date
+from blueprints.auth_utils import get_current_user
 from sqlalchemy import or_, and_
+from sqlalchemy.orm import load_only
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 main_bp = Blueprint("main", __name__)
 
+# Columns a homepage Category 1 card reads (skips description, delivery details, phones, ...)
+CATEGORY1_CARD_COLUMNS = (
+    Category1Listing.id, Category1Listing.title, Category1Listing.origin_airport,
+    Category1Listing.destination_airport, Category1Listing.travel_date, Category1Listing.currency,
+    Category1Listing.price_per_kg, Category1Listing.total_weight, Category1Listing.discount_percent,
+    Category1Listing.passport_photo_url
+)
+
+
+def _rollup_upsert(page_url, now):
+    """INSERT a page's rollup row or bump its count, in the running dialect's upsert syntax"""
+    bump = {"visit_count": SiteVisitRollup.visit_count + 1, "updated_at": now}
+    values = {"page_url": page_url, "visit_count": 1, "updated_at": now}
+    
+    # SQLite is the test database; production runs MySQL
+    if db.engine.dialect.name == "sqlite":
+        return sqlite_insert(SiteVisitRollup).values(**values).on_conflict_do_update(
+            index_elements=[SiteVisitRollup.page_url], set_=bump
+        )
+    return mysql_insert(SiteVisitRollup).values(**values).on_duplicate_key_update(**bump)
+
 
-# Find line ~9-16 (track_visit function):
 @main_bp.before_app_request
 def track_visit():
     """Track page visits for analytics"""
+    now = datetime.utcnow()
     try:
-        visit = SiteVisit(
+        db.session.add(SiteVisit(
             page_url=request.path,
             ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-        from models import db
-        db.session.add(visit)
+            user_agent=request.headers.get('User-Agent'),
+            created_at=now
+        ))
+        
+        # ✅ Keep the per-page rollup current so the dashboard never GROUP BYs site_visits
+        db.session.execute(_rollup_upsert(request.path, now))
         db.session.commit()
     except Exception as e:
         # ✅ ADD ROLLBACK TO PREVENT SESSION ERRORS
-        from models import db
         db.session.rollback()
-        print(f"⚠️ Failed to track visit: {e}")
+        current_app.logger.warning("Failed to track visit: %s", e)
+
 
 @main_bp.app_context_processor
 def inject_current_user():
     """Make current user available in all templates"""
-    user = None
-    if 'user_id' in session:
-        user = User.query.get(session['user_id'])
-    return dict(current_user=user)
+    # Lazy: the users row is only loaded if a template actually touches current_user
+    return dict(current_user=LocalProxy(get_current_user))
 
 
 @main_bp.route("/")
@@ -61,8 +87,10 @@ def index():
     in_stock = request.args.get('in_stock', '')
     
     # Common filters
-    max_price = request.args.get('max_price', '')
-    min_discount = request.args.get('min_discount', '')
+    # Parsed once for all three categories; malformed numbers are ignored (None) instead of a 500.
+    # Categories 2 and 3 have a flat price and no discount, so min_discount only narrows Category 1.
+    max_price = request.args.get('max_price', type=float)
+    min_discount = request.args.get('min_discount', type=float)
     search_query = request.args.get('q', '').strip()
     
     # ========================================
@@ -75,13 +103,13 @@ def index():
     if destination_airport:
         cat1_query = cat1_query.filter(Category1Listing.destination_airport.ilike(f'%{destination_airport}%'))
     if date_from:
-        cat1_query = cat1_query.filter(Category1Listing.travel_date >= datetime.strptime(date_from, '%Y-%m-%d').date())
+        cat1_query = cat1_query.filter(Category1Listing.travel_date >= date.fromisoformat(date_from))
     if date_to:
-        cat1_query = cat1_query.filter(Category1Listing.travel_date <= datetime.strptime(date_to, '%Y-%m-%d').date())
-    if max_price:
-        cat1_query = cat1_query.filter(Category1Listing.final_price <= float(max_price))
-    if min_discount:
-        cat1_query = cat1_query.filter(Category1Listing.discount_percent >= float(min_discount))
+        cat1_query = cat1_query.filter(Category1Listing.travel_date <= date.fromisoformat(date_to))
+    if max_price is not None:
+        cat1_query = cat1_query.filter(Category1Listing.final_price <= max_price)
+    if min_discount is not None:
+        cat1_query = cat1_query.filter(Category1Listing.discount_percent >= min_discount)
     if search_query:
         cat1_query = cat1_query.filter(
             or_(
@@ -101,8 +129,6 @@ def index():
     else:  # newest
         cat1_query = cat1_query.order_by(Category1Listing.created_at.desc())
     
-    category1_listings = cat1_query.all()
-    
     # ========================================
     # Query Category 2 Listings
     # ========================================
@@ -115,11 +141,9 @@ def index():
     if travel_to:
         cat2_query = cat2_query.filter(Category2Listing.travel_to.ilike(f'%{travel_to}%'))
     if travel_date:
-        cat2_query = cat2_query.filter(Category2Listing.travel_date == datetime.strptime(travel_date, '%Y-%m-%d').date())
-    if max_price:
-        cat2_query = cat2_query.filter(Category2Listing.final_price <= float(max_price))
-    if min_discount:
-        cat2_query = cat2_query.filter(Category2Listing.discount_percent >= float(min_discount))
+        cat2_query = cat2_query.filter(Category2Listing.travel_date == date.fromisoformat(travel_date))
+    if max_price is not None:
+        cat2_query = cat2_query.filter(Category2Listing.price <= max_price)
     if search_query:
         cat2_query = cat2_query.filter(
             or_(
@@ -131,16 +155,12 @@ def index():
     
     # Apply sorting
     if sort_by == 'price_low':
-        cat2_query = cat2_query.order_by(Category2Listing.final_price.asc())
+        cat2_query = cat2_query.order_by(Category2Listing.price.asc())
     elif sort_by == 'price_high':
-        cat2_query = cat2_query.order_by(Category2Listing.final_price.desc())
-    elif sort_by == 'discount':
-        cat2_query = cat2_query.order_by(Category2Listing.discount_percent.desc())
-    else:  # newest
+        cat2_query = cat2_query.order_by(Category2Listing.price.desc())
+    else:  # newest (no discount column to sort on)
         cat2_query = cat2_query.order_by(Category2Listing.created_at.desc())
     
-    category2_listings = cat2_query.all()
-    
     # ========================================
     # Query Category 3 Products
     # ========================================
@@ -152,10 +172,8 @@ def index():
         cat3_query = cat3_query.filter(Category3Product.product_origin_country.ilike(f'%{origin_country}%'))
     if in_stock == 'yes':
         cat3_query = cat3_query.filter(Category3Product.stock > 0)
-    if max_price:
-        cat3_query = cat3_query.filter(Category3Product.final_price <= float(max_price))
-    if min_discount:
-        cat3_query = cat3_query.filter(Category3Product.discount_percent >= float(min_discount))
+    if max_price is not None:
+        cat3_query = cat3_query.filter(Category3Product.price <= max_price)
     if search_query:
         cat3_query = cat3_query.filter(
             or_(
@@ -166,21 +184,33 @@ def index():
     
     # Apply sorting
     if sort_by == 'price_low':
-        cat3_query = cat3_query.order_by(Category3Product.final_price.asc())
+        cat3_query = cat3_query.order_by(Category3Product.price.asc())
     elif sort_by == 'price_high':
-        cat3_query = cat3_query.order_by(Category3Product.final_price.desc())
-    elif sort_by == 'discount':
-        cat3_query = cat3_query.order_by(Category3Product.discount_percent.desc())
-    else:  # newest
+        cat3_query = cat3_query.order_by(Category3Product.price.desc())
+    else:  # newest (no discount column to sort on)
         cat3_query = cat3_query.order_by(Category3Product.created_at.desc())
     
-    category3_products = cat3_query.all()
+    # ========================================
+    # Fetch only what the page renders
+    # ========================================
+    # Cards are drawn for the selected tab alone; the other tabs just show a count
+    cat1_query = cat1_query.options(load_only(*CATEGORY1_CARD_COLUMNS))
+    
+    results, counts = {}, {}
+    for name, query in (("category1", cat1_query), ("category2", cat2_query), ("category3", cat3_query)):
+        if name == category_filter:
+            results[name] = query.all()
+            counts[name] = len(results[name])
+        else:
+            results[name] = []
+            counts[name] = query.order_by(None).count()
     
     return render_template(
         "home.html",
-        category1_listings=category1_listings,
-        category2_listings=category2_listings,
-        category3_products=category3_products
+        category1_listings=results["category1"],
+        category2_listings=results["category2"],
+        category3_products=results["category3"],
+        category_counts=counts
     )
 
 
@@ -31,6 +31,26 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False  # Set to True for SQL debugging
     
+    # Connection pool (reuse connections across requests, drop stale ones)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,  # Recycle before MySQL wait_timeout closes the connection
+        "pool_timeout": 30,  # Seconds to wait for a free pooled connection
+        "connect_args": {
+            "connection_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 10)),
+        },
+    }
+    
+    # ============================================
+    # CACHING (Flask-Caching)
+    # ============================================
+    # SimpleCache is per-process; use RedisCache + CACHE_REDIS_URL to share across workers
+    CACHE_TYPE = os.environ.get("CACHE_TYPE", "SimpleCache")
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "")
+    CACHE_DEFAULT_TIMEOUT = 60
+    
     # ============================================
     # FIREBASE ADMIN SDK (Server-side)
     # ============================================
@@ -137,7 +157,19 @@ class TestingConfig(Config):
     """Testing-specific configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"  # In-memory SQLite for tests
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # SQLite's pool does not accept size/overflow options
     WTF_CSRF_ENABLED = False
+    CACHE_TYPE = "NullCache"
+
+
+def validate_config():
+    """Fail fast on missing settings the app cannot start without"""
+    missing = [name for name in ("SECRET_KEY", "DB_NAME", "DB_HOST") if not getattr(Config, name)]
+    if missing:
+        raise ValueError(f"Missing required configuration: {', '.join(missing)}")
+    
+    if not os.path.isfile(Config.FIREBASE_CREDENTIALS):
+        raise FileNotFoundError(f"Firebase credentials file not found: {Config.FIREBASE_CREDENTIALS}")
 
 
 # Configuration dictionary
@@ -0,0 +1,31 @@
+"""
+Shared Flask extension instances for Maa Express
+Initialized against the app in create_app()
+"""
+
+import orjson
+from flask.json.provider import JSONProvider, DefaultJSONProvider
+from flask_caching import Cache
+
+cache = Cache()
+
+
+class ORJSONProvider(JSONProvider):
+    """jsonify / request.get_json backed by orjson, same output types as Flask's default"""
+
+    # Sorted/stringified keys like Flask's default; dates go through Flask's handler to keep HTTP-date strings
+    _options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _dumpb(self, obj, option=0):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self._options | option)
+
+    def dumps(self, obj, **kwargs):
+        return self._dumpb(obj).decode()
+
+    def response(self, *args, **kwargs):
+        # ✅ Hand orjson's bytes straight to the Response (no str decode/re-encode); trailing newline like Flask's
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumpb(obj, orjson.OPT_APPEND_NEWLINE), mimetype="application/json")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
@@ -1,8 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
 
 db = SQLAlchemy()
 
+# Moderation states shared by the admin_status ENUM columns and the admin handlers
+CATEGORY1_STATUSES = ('pending', 'approved', 'rejected', 'deleted', 'sold', 'refunded')
+LISTING_STATUSES = ('pending', 'approved', 'rejected', 'deleted')
+
 # ============================================================================
 # USER MODEL
 # ============================================================================
@@ -10,11 +15,15 @@ db = SQLAlchemy()
 class User(db.Model):
     """User accounts with authentication and payout details"""
     __tablename__ = "users"
+    __table_args__ = (
+        # Recent users / users page ORDER BY created_at, analytics registrations range
+        db.Index('ix_users_created', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(255))
     email = db.Column(db.String(255), unique=True, nullable=False)
-    phone = db.Column(db.String(30))
+    phone = db.Column(db.String(30), unique=True)
     password_hash = db.Column(db.String(255), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -55,6 +64,17 @@ class User(db.Model):
 class Category1Listing(db.Model):
     """In-flight luggage space listings"""
     __tablename__ = "category1_listings"
+    __table_args__ = (
+        # Account page: WHERE seller = ? AND admin_status != 'deleted' ORDER BY created_at DESC
+        db.Index('ix_cat1_seller_created', 'seller_id', 'created_at'),
+        db.Index('ix_cat1_seller_status', 'seller_id', 'admin_status'),
+        # Admin dashboard / moderation lists: WHERE admin_status = ? (ORDER BY id via the implicit PK suffix)
+        db.Index('ix_cat1_admin_status', 'admin_status'),
+        # Public browsing of approved listings: marketplace ORDER BY travel_date, homepage sorts
+        db.Index('ix_cat1_status_travel', 'admin_status', 'travel_date'),
+        db.Index('ix_cat1_status_created', 'admin_status', 'created_at'),
+        db.Index('ix_cat1_status_discount', 'admin_status', 'discount_percent'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -93,7 +113,7 @@ class Category1Listing(db.Model):
     
     # Status
     admin_status = db.Column(
-        db.Enum('pending', 'approved', 'rejected', name="cat1_status_enum"),
+        db.Enum(*CATEGORY1_STATUSES, name="cat1_status_enum"),
         default='pending'
     )
     
@@ -104,7 +124,7 @@ class Category1Listing(db.Model):
     # Relationships
     buyer_infos = db.relationship('Category1BuyerInfo', backref='listing', lazy=True)
 
-    @property
+    @hybrid_property
     def final_price(self):
         """Calculate final price after discount"""
         if self.price_per_kg and self.total_weight:
@@ -115,6 +135,13 @@ class Category1Listing(db.Model):
             return subtotal
         return 0.0
 
+    @final_price.inplace.expression
+    @classmethod
+    def _final_price_expression(cls):
+        """Same price as SQL, so homepage filters and sorts run in the query"""
+        subtotal = db.func.coalesce(cls.price_per_kg * cls.total_weight, 0)
+        return subtotal * (1 - db.func.coalesce(cls.discount_percent, 0) / 100)
+
     def __repr__(self):
         return f"<Category1Listing {self.id}: {self.origin} → {self.destination}>"
 
@@ -126,6 +153,12 @@ class Category1Listing(db.Model):
 class Category1BuyerInfo(db.Model):
     """Purchase/booking details for Category 1 listings"""
     __tablename__ = "category1_buyer_info"
+    __table_args__ = (
+        # Purchase history: WHERE buyer = ? ORDER BY created_at DESC
+        db.Index('ix_cat1buyer_buyer_created', 'buyer_id', 'created_at'),
+        # Pending manual payments queue
+        db.Index('ix_cat1buyer_payment_status', 'payment_status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     listing_id = db.Column(db.Integer, db.ForeignKey('category1_listings.id'), nullable=False)
@@ -197,6 +230,13 @@ class Category1BuyerInfo(db.Model):
 class Category2Listing(db.Model):
     """Document carry service listings"""
     __tablename__ = "category2_listings"
+    __table_args__ = (
+        db.Index('ix_cat2_seller_created', 'seller_id', 'created_at'),
+        db.Index('ix_cat2_seller_status', 'seller_id', 'admin_status'),
+        db.Index('ix_cat2_admin_status', 'admin_status'),
+        # Homepage newest-first tab: WHERE admin_status = 'approved' ORDER BY created_at DESC
+        db.Index('ix_cat2_status_created', 'admin_status', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -209,7 +249,7 @@ class Category2Listing(db.Model):
     price = db.Column(db.Numeric(10, 2))
     
     admin_status = db.Column(
-        db.Enum('pending', 'approved', 'rejected', name="cat2_status_enum"),
+        db.Enum(*LISTING_STATUSES, name="cat2_status_enum"),
         default='pending'
     )
     
@@ -226,6 +266,13 @@ class Category2Listing(db.Model):
 class Category3Product(db.Model):
     """Products for sale from travelers"""
     __tablename__ = "category3_products"
+    __table_args__ = (
+        db.Index('ix_cat3_seller_created', 'seller_id', 'created_at'),
+        db.Index('ix_cat3_seller_status', 'seller_id', 'admin_status'),
+        db.Index('ix_cat3_admin_status', 'admin_status'),
+        # Homepage newest-first tab: WHERE admin_status = 'approved' ORDER BY created_at DESC
+        db.Index('ix_cat3_status_created', 'admin_status', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -239,7 +286,7 @@ class Category3Product(db.Model):
     image_url = db.Column(db.String(500))
     
     admin_status = db.Column(
-        db.Enum('pending', 'approved', 'rejected', name="cat3_status_enum"),
+        db.Enum(*LISTING_STATUSES, name="cat3_status_enum"),
         default='pending'
     )
     
@@ -256,6 +303,9 @@ class Category3Product(db.Model):
 class SiteVisit(db.Model):
     """Track page visits for analytics"""
     __tablename__ = "site_visits"
+    __table_args__ = (
+        db.Index('ix_site_visits_created', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     page_url = db.Column(db.String(500))
@@ -267,9 +317,40 @@ class SiteVisit(db.Model):
         return f"<SiteVisit {self.id}: {self.page_url}>"
 
 
+class SiteVisitRollup(db.Model):
+    """Running visit count per page, kept in step with SiteVisit inserts"""
+    __tablename__ = "site_visit_rollup"
+    
+    page_url = db.Column(db.String(500), primary_key=True)
+    visit_count = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SiteVisitRollup {self.page_url}: {self.visit_count}>"
+
+
+class DailyStats(db.Model):
+    """Per-day visit/login/registration totals, written by `flask rollup-daily-stats`"""
+    __tablename__ = "daily_stats"
+    
+    date = db.Column(db.Date, primary_key=True)
+    visits = db.Column(db.Integer, nullable=False, default=0)
+    logins = db.Column(db.Integer, nullable=False, default=0)
+    registrations = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<DailyStats {self.date}: {self.visits} visits>"
+
+
 class UserLoginLog(db.Model):
     """Track user login history"""
     __tablename__ = "user_login_logs"
+    __table_args__ = (
+        db.Index('ix_login_logs_user_time', 'user_id', 'login_time'),
+        # Analytics / dashboard login counts: WHERE login_time >= ? (no user_id)
+        db.Index('ix_login_logs_time', 'login_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -278,4 +359,14 @@ class UserLoginLog(db.Model):
     login_time = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f"<UserLoginLog {self.id}: User {self.user_id} at {self.login_time}>"
\ No newline at end of file
+        return f"<UserLoginLog {self.id}: User {self.user_id} at {self.login_time}>"
+
+# ============================================================================
+# EXPRESSION INDEXES
+# ============================================================================
+
+# Analytics buckets by DATE(col): filtering and grouping on the same expression lets
+# MySQL (8.0.13+) walk these in order instead of building a temp table per series
+db.Index('ix_site_visits_day', db.func.date(SiteVisit.created_at))
+db.Index('ix_login_logs_day', db.func.date(UserLoginLog.login_time))
+db.Index('ix_users_created_day', db.func.date(User.created_at))
@@ -0,0 +1,181 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from models import db, User, Category1Listing, Category2Listing, Category3Product, Category1BuyerInfo
+
+
+@pytest.fixture
+def seller(app):
+    user = User(email="seller@example.com", full_name="Seller", password_hash="x")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def seller_client(client, seller):
+    """Test client logged in as the seller"""
+    with client.session_transaction() as sess:
+        sess["user_id"] = seller.id
+    return client
+
+
+@pytest.fixture
+def listing(seller):
+    listing = Category1Listing(
+        seller_id=seller.id, title="Sydney to Dhaka", origin="Sydney", destination="Dhaka",
+        travel_date=date(2030, 1, 1), price_per_kg=Decimal("10"), total_weight=Decimal("5"),
+        admin_status="approved"
+    )
+    db.session.add(listing)
+    db.session.commit()
+    return listing
+
+
+def _reload(model, item_id):
+    db.session.expire_all()
+    return db.session.get(model, item_id)
+
+
+def test_account_page_lists_own_listings(seller_client, listing):
+    response = seller_client.get("/account/")
+    assert response.status_code == 200
+    assert b"Sydney to Dhaka" in response.data
+
+
+def test_sales_dashboard_shows_sales_of_own_listings(seller_client, listing):
+    buyer = User(email="buyer@example.com", password_hash="x")
+    db.session.add(buyer)
+    db.session.flush()
+    db.session.add(Category1BuyerInfo(
+        listing_id=listing.id, buyer_id=buyer.id, handover_code="AAAAAA", delivery_code="BBBBBB",
+        receiver_fullname="Receiver Name"
+    ))
+    db.session.commit()
+
+    response = seller_client.get("/account/sales")
+    assert response.status_code == 200
+    assert b"Sydney to Dhaka" in response.data
+
+
+@pytest.mark.parametrize("model, path", [
+    (Category1Listing, "/account/category1/{}/delete"),
+    (Category2Listing, "/account/category2/{}/delete"),
+    (Category3Product, "/account/category3/{}/delete"),
+])
+def test_owner_soft_deletes_item(seller_client, seller, model, path):
+    item = model(seller_id=seller.id, admin_status="approved")
+    db.session.add(item)
+    db.session.commit()
+
+    assert seller_client.post(path.format(item.id)).status_code == 302
+    assert _reload(model, item.id).admin_status == "deleted"
+
+
+def test_soft_delete_of_someone_elses_listing_is_404(client, listing):
+    other = User(email="other@example.com", password_hash="x")
+    db.session.add(other)
+    db.session.commit()
+    with client.session_transaction() as sess:
+        sess["user_id"] = other.id
+
+    assert client.post(f"/account/category1/{listing.id}/delete").status_code == 404
+    assert _reload(Category1Listing, listing.id).admin_status == "approved"
+
+
+def test_edit_category1_listing_round_trip(seller_client, listing):
+    assert seller_client.get(f"/account/category1/{listing.id}/edit").status_code == 200
+
+    response = seller_client.post(f"/account/category1/{listing.id}/edit", data={
+        "title": "Melbourne to Dhaka", "origin": "Melbourne", "destination": "Dhaka",
+        "price_per_kg": "12", "total_weight": "4", "discount_percent": "0",
+    })
+    assert response.status_code == 302
+
+    listing = _reload(Category1Listing, listing.id)
+    assert (listing.title, listing.origin, listing.price_per_kg) == ("Melbourne to Dhaka", "Melbourne", Decimal("12"))
+    # Approved listings go back to review after an owner edit
+    assert listing.admin_status == "pending"
+
+
+def test_edit_of_someone_elses_listing_is_404(client, listing):
+    other = User(email="other@example.com", password_hash="x")
+    db.session.add(other)
+    db.session.commit()
+    with client.session_transaction() as sess:
+        sess["user_id"] = other.id
+
+    assert client.get(f"/account/category1/{listing.id}/edit").status_code == 404
+    assert client.post(f"/account/category1/{listing.id}/edit", data={"title": "Mine now"}).status_code == 404
+    assert _reload(Category1Listing, listing.id).title == "Sydney to Dhaka"
+
+
+def test_edit_category2_listing_saves_columns(seller_client, seller):
+    listing = Category2Listing(seller_id=seller.id, title="Docs", origin="Sydney", destination="Dhaka")
+    db.session.add(listing)
+    db.session.commit()
+
+    assert seller_client.get(f"/account/category2/{listing.id}/edit").status_code == 200
+    response = seller_client.post(f"/account/category2/{listing.id}/edit", data={
+        "title": "Passport papers", "description": "Sealed envelope", "origin": "Perth",
+        "destination": "Chittagong", "travel_date": "2030-02-01", "price": "40",
+    })
+    assert response.status_code == 302
+
+    listing = _reload(Category2Listing, listing.id)
+    assert (listing.title, listing.origin, listing.destination) == ("Passport papers", "Perth", "Chittagong")
+    assert (listing.travel_date, listing.price) == (date(2030, 2, 1), Decimal("40"))
+
+
+def test_edit_category3_product_saves_columns(seller_client, seller):
+    product = Category3Product(seller_id=seller.id, product_name="Tea", price=Decimal("5"))
+    db.session.add(product)
+    db.session.commit()
+
+    assert seller_client.get(f"/account/category3/{product.id}/edit").status_code == 200
+    response = seller_client.post(f"/account/category3/{product.id}/edit", data={
+        "product_name": "Green tea", "product_origin_country": "Bangladesh", "description": "",
+        "price": "7.25", "currency": "BDT", "authenticity_proof_url": "", "image_url": "",
+    })
+    assert response.status_code == 302
+
+    product = _reload(Category3Product, product.id)
+    assert (product.product_name, product.product_origin_country) == ("Green tea", "Bangladesh")
+    assert (product.price, product.currency) == (Decimal("7.25"), "BDT")
+
+
+@pytest.fixture
+def sale(listing):
+    buyer = User(email="buyer@example.com", password_hash="x")
+    db.session.add(buyer)
+    db.session.flush()
+    sale = Category1BuyerInfo(
+        listing_id=listing.id, buyer_id=buyer.id, handover_code="ABC234", delivery_code="XYZ789",
+        payment_status="paid", status="pending_handover"
+    )
+    db.session.add(sale)
+    db.session.commit()
+    return sale
+
+
+def test_seller_verifies_handover_and_delivery(seller_client, sale):
+    assert seller_client.get(f"/account/verify-handover/{sale.id}").status_code == 200
+
+    wrong = seller_client.post(f"/account/verify-handover/{sale.id}", json={"handover_code": "nope"})
+    assert wrong.status_code == 400
+    assert seller_client.post(f"/account/verify-handover/{sale.id}", json={"handover_code": "abc234"}).json["success"]
+    assert seller_client.post(f"/account/verify-delivery/{sale.id}", json={"delivery_code": "XYZ789"}).json["success"]
+
+    sale = _reload(Category1BuyerInfo, sale.id)
+    assert (sale.status, sale.handover_attempts) == ("delivered", 1)
+
+
+def test_verify_handover_rejects_other_users(client, sale):
+    with client.session_transaction() as sess:
+        sess["user_id"] = sale.buyer_id
+
+    response = client.post(f"/account/verify-handover/{sale.id}", json={"handover_code": "ABC234"})
+    assert response.status_code == 302
+    assert _reload(Category1BuyerInfo, sale.id).handover_verified_at is None
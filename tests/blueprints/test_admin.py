@@ -0,0 +1,152 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from models import db, User, Category1Listing, Category2Listing, Category3Product
+
+
+@pytest.fixture
+def admin_client(app, client):
+    """Test client logged in as an admin (plus a second user to reassign listings to)"""
+    admin = User(email="admin@example.com", password_hash="x", is_admin=True)
+    other = User(email="seller@example.com", password_hash="x")
+    db.session.add_all([admin, other])
+    db.session.commit()
+    with client.session_transaction() as sess:
+        sess["user_id"] = admin.id
+    client.other_user_id = other.id
+    return client
+
+
+def _reload(model, item_id):
+    db.session.expire_all()
+    return db.session.get(model, item_id)
+
+
+def test_edit_category1_listing_saves_columns(admin_client):
+    listing = Category1Listing(
+        seller_id=1, title="Old", origin="Sydney", destination="Dhaka",
+        travel_date=date(2030, 1, 1), price_per_kg=Decimal("10"), total_weight=Decimal("5")
+    )
+    db.session.add(listing)
+    db.session.commit()
+
+    response = admin_client.post(f"/admin/category1/{listing.id}/edit", data={
+        "user_id": admin_client.other_user_id,
+        "title": "New title",
+        "price_per_kg": "12.50",
+        "description": "Updated",
+        "admin_status": "approved",
+    })
+    assert response.status_code == 302
+
+    listing = _reload(Category1Listing, listing.id)
+    assert listing.title == "New title"
+    assert listing.seller_id == admin_client.other_user_id
+    assert listing.price_per_kg == Decimal("12.50")
+    assert listing.description == "Updated"
+    assert listing.admin_status == "approved"
+    # Blank keep-if-blank fields are untouched
+    assert listing.origin == "Sydney"
+
+
+def test_edit_category2_listing_saves_columns(admin_client):
+    listing = Category2Listing(seller_id=1, title="Docs", origin="Sydney", destination="Dhaka")
+    db.session.add(listing)
+    db.session.commit()
+
+    response = admin_client.post(f"/admin/category2/{listing.id}/edit", data={
+        "title": "Passport papers",
+        "destination": "Chittagong",
+        "price": "40",
+    })
+    assert response.status_code == 302
+
+    listing = _reload(Category2Listing, listing.id)
+    assert (listing.title, listing.origin, listing.destination) == ("Passport papers", "Sydney", "Chittagong")
+    assert listing.price == Decimal("40")
+
+
+def test_edit_category3_product_saves_columns(admin_client):
+    product = Category3Product(seller_id=1, product_name="Tea", price=Decimal("5"))
+    db.session.add(product)
+    db.session.commit()
+
+    response = admin_client.post(f"/admin/category3/{product.id}/edit", data={
+        "product_name": "Green tea",
+        "price": "7.25",
+        "product_origin_country": "Bangladesh",
+    })
+    assert response.status_code == 302
+
+    product = _reload(Category3Product, product.id)
+    assert (product.product_name, product.price) == ("Green tea", Decimal("7.25"))
+    assert product.product_origin_country == "Bangladesh"
+
+
+def test_edit_missing_listing_is_404(admin_client):
+    response = admin_client.post("/admin/category1/999/edit", data={"title": "Nope"})
+    assert response.status_code == 404
+
+
+
+def test_category1_listings_query_count_is_flat(admin_client, count_queries):
+    def statements_for_page():
+        count_queries.clear()
+        assert admin_client.get("/admin/category1").status_code == 200
+        return len(count_queries)
+
+    db.session.add(Category1Listing(seller_id=1, title="First", admin_status="pending"))
+    db.session.commit()
+    one_row = statements_for_page()
+
+    db.session.add_all(Category1Listing(seller_id=1, title=f"Listing {i}", admin_status="pending") for i in range(5))
+    db.session.commit()
+    # Nothing lazy-loads per listing, so more rows run no more statements
+    assert statements_for_page() == one_row
+
+
+@pytest.mark.parametrize("query, days", [("?days=abc", 30), ("?days=0", 1), ("?days=100000", 365), ("?days=14", 14)])
+def test_analytics_days_is_parsed_and_clamped(admin_client, query, days):
+    response = admin_client.get(f"/admin/analytics{query}")
+    assert response.status_code == 200
+    assert f"last {days} days".encode() in response.data
+
+
+@pytest.mark.parametrize("flag", ["is_admin", "is_active"])
+def test_admin_access_revoked_on_next_request(cached_app, flag):
+    admin = User(email="admin@example.com", password_hash="x", is_admin=True)
+    db.session.add(admin)
+    db.session.commit()
+    client = cached_app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = admin.id
+
+    assert client.get("/admin/users").status_code == 200
+    assert client.get("/admin/users").status_code == 200  # served from the cached profile
+
+    setattr(admin, flag, False)
+    db.session.commit()
+    response = client.get("/admin/users")
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/")
+
+
+def test_toggle_admin_demotes_without_waiting_for_recheck(cached_app):
+    admin = User(email="admin@example.com", password_hash="x", is_admin=True)
+    other_admin = User(email="other@example.com", password_hash="x", is_admin=True)
+    db.session.add_all([admin, other_admin])
+    db.session.commit()
+
+    demoted = cached_app.test_client()
+    with demoted.session_transaction() as sess:
+        sess["user_id"] = other_admin.id
+    assert demoted.get("/admin/users").status_code == 200
+
+    acting = cached_app.test_client()
+    with acting.session_transaction() as sess:
+        sess["user_id"] = admin.id
+    assert acting.post(f"/admin/users/{other_admin.id}/toggle-admin").json == {"ok": True, "is_admin": False}
+
+    assert demoted.get("/admin/users").status_code == 302
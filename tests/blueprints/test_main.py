@@ -0,0 +1,55 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from models import db, User, Category1Listing, Category2Listing, Category3Product
+
+
+@pytest.fixture
+def listings(app):
+    """A cheap discounted and a pricey undiscounted Category 1 listing, plus Category 2/3 rows above max_price=10"""
+    seller = User(email="seller@example.com", password_hash="x")
+    db.session.add(seller)
+    db.session.flush()
+    db.session.add_all([
+        Category1Listing(seller_id=seller.id, title="Cheap", admin_status="approved", travel_date=date(2030, 1, 1),
+                         price_per_kg=Decimal("2"), total_weight=Decimal("5"), discount_percent=Decimal("10")),
+        Category1Listing(seller_id=seller.id, title="Pricey", admin_status="approved", travel_date=date(2030, 1, 1),
+                         price_per_kg=Decimal("20"), total_weight=Decimal("5"), discount_percent=Decimal("0")),
+        Category2Listing(seller_id=seller.id, title="Docs", admin_status="approved", price=Decimal("80")),
+        Category3Product(seller_id=seller.id, product_name="Tea", admin_status="approved", price=Decimal("80")),
+    ])
+    db.session.commit()
+
+
+def test_final_price_filters_in_sql(listings):
+    cheap = Category1Listing.query.filter(Category1Listing.final_price <= 10).all()
+    assert [listing.title for listing in cheap] == ["Cheap"]
+    assert cheap[0].final_price == pytest.approx(9.0)
+
+
+@pytest.mark.parametrize("category", ["category1", "category2", "category3"])
+@pytest.mark.parametrize("sort", ["price_low", "price_high", "discount", "newest"])
+def test_homepage_price_and_discount_filters(client, listings, category, sort):
+    response = client.get(f"/?max_price=10&min_discount=5&category={category}&sort={sort}")
+    assert response.status_code == 200
+    assert (b"Pricey" in response.data, b"Cheap" in response.data) == (False, category == "category1")
+
+
+def test_homepage_ignores_malformed_numbers(client, listings):
+    assert client.get("/?max_price=abc&min_discount=").status_code == 200
+
+
+def test_track_visit_logs_visit_and_bumps_rollup(app, client, caplog):
+    from models import SiteVisit, SiteVisitRollup
+
+    client.get("/auth/api/check-session")
+    assert SiteVisit.query.count() == 1
+    assert db.session.get(SiteVisitRollup, "/auth/api/check-session").visit_count == 1
+
+    client.get("/auth/api/check-session")
+    db.session.expire_all()
+    assert SiteVisit.query.count() == 2
+    assert db.session.get(SiteVisitRollup, "/auth/api/check-session").visit_count == 2
+    assert "Failed to track visit" not in caplog.text
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from config import TestingConfig
+from models import db
+
+
+@pytest.fixture
+def app():
+    """App on an in-memory SQLite database with fresh tables per test"""
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def cached_app():
+    """Like `app`, but with a real (SimpleCache) store so memoized lookups and their invalidation run"""
+    class CachedTestingConfig(TestingConfig):
+        CACHE_TYPE = "SimpleCache"
+
+    app = create_app(CachedTestingConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(app):
+    """List that collects every SQL statement run while the test executes (N+1 guard)"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
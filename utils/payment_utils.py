@@ -82,6 +82,25 @@ else:
 # CODE GENERATION FUNCTIONS
 # ============================================
 
+# Handover/delivery code alphabet and length (built once, not per call)
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 8
+_CODE_SPACE = len(CODE_ALPHABET) ** CODE_LENGTH
+
+
+def _secure_code():
+    """
+    Uniform random code from a single CSPRNG draw: one secrets.randbelow over the
+    whole code space, written out in base-36, instead of eight secrets.choice calls
+    """
+    value = secrets.randbelow(_CODE_SPACE)
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(CODE_ALPHABET))
+        chars.append(CODE_ALPHABET[digit])
+    return ''.join(chars)
+
+
 def generate_handover_code():
     """
     Generate cryptographically secure 8-character handover code
@@ -101,8 +120,7 @@ def generate_handover_code():
         >>> code.isalnum()
         True
     """
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(secrets.choice(characters) for _ in range(8))
+    return _secure_code()
 
 
 def generate_delivery_code():
@@ -122,8 +140,7 @@ def generate_delivery_code():
         >>> code.isupper()
         True
     """
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(secrets.choice(characters) for _ in range(8))
+    return _secure_code()
 
 
 def generate_tracking_number(buyer_info_id):